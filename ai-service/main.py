@@ -16,6 +16,7 @@ def main():
     print(f"Host: {settings.HOST}")
     print(f"Port: {settings.PORT}")
     print(f"Debug: {settings.DEBUG}")
+    print(f"Workers: {1 if settings.DEBUG else settings.WORKERS}")
     print(f"Replicate API: {'Configured' if settings.REPLICATE_API_TOKEN else 'NOT CONFIGURED'}")
     print("=" * 60)
 
@@ -24,6 +25,9 @@ def main():
         host=settings.HOST,
         port=settings.PORT,
         reload=settings.DEBUG,
+        workers=1 if settings.DEBUG else settings.WORKERS,
+        loop="auto",
+        http="auto",
         log_level="info" if settings.DEBUG else "warning",
     )
 
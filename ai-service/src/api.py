@@ -4,15 +4,23 @@ RESTful API for structure-preserving sigil enhancement.
 """
 
 import io
+import os
+import uuid
 import base64
 import asyncio
+from functools import partial
 from typing import Optional
 from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
 
 from fastapi import FastAPI, HTTPException, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from pydantic import BaseModel, Field
 from PIL import Image
+import numpy as np
+import cv2
 
 from .config import (
     settings,
@@ -20,11 +28,22 @@ from .config import (
     controlnet_config,
     structure_match_config,
 )
-from .preprocessing import preprocess_control_image, image_to_base64
+from .preprocessing import (
+    preprocess_control_image,
+    image_to_base64,
+    base64_to_bytes,
+    ControlImageResult,
+)
 from .generation import (
     generate_styled_variations,
     generate_with_auto_retry,
+    iter_styled_variations,
+    close_http_client,
+    get_generation_stats,
+    StyledVariationsResult,
+    GenerationResult,
 )
+from .batching import AsyncBatchQueue
 from .structure_matching import compute_structure_match
 from .compositing import composite_original_lines, hybrid_enhancement
 
@@ -138,17 +157,77 @@ class HealthResponse(BaseModel):
     available_styles: list[str]
 
 
+class MetricsResponse(BaseModel):
+    """Replicate concurrency gauges (per worker process)."""
+
+    generation_limit: int
+    generations_active: int
+    generations_waiting: int
+
+
 # ============================================================================
 # Application Setup
 # ============================================================================
 
+async def _batched_generate(
+    key: tuple[str, str],
+    num_variations_list: list[int]
+) -> list[StyledVariationsResult]:
+    """
+    Generate variations for a group of enhance requests sharing a sigil and style.
+
+    The group shares one preprocessing pass (cached by sigil). Seeds and
+    the retry decision stay per request. Requests asking for the same
+    number of variations get identical seeds, so they share one
+    generation.
+    """
+    sigil_svg, style_choice = key
+
+    # Warm the preprocessing cache once for the whole group
+    await run_blocking(preprocess_control_image, sigil_svg)
+
+    sizes = list(dict.fromkeys(num_variations_list))
+    results = await asyncio.gather(*[
+        generate_with_auto_retry(sigil_svg, style_choice, num_variations=size)
+        for size in sizes
+    ])
+
+    by_size = dict(zip(sizes, results))
+    return [by_size[size] for size in num_variations_list]
+
+
+# Micro-batches concurrent /enhance requests (started in lifespan)
+enhance_queue = AsyncBatchQueue(
+    process_fn=_batched_generate,
+    max_batch_size=8,
+    max_wait_time=0.05,
+)
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan handler."""
     print("Anchor AI Service starting...")
     print(f"Available styles: {list(STYLE_PRESETS.keys())}")
     print(f"Replicate configured: {bool(settings.REPLICATE_API_TOKEN)}")
+
+    # Each worker gets at least one Replicate slot, so the service-wide cap
+    # only holds while WORKERS <= MAX_CONCURRENT_GENERATIONS
+    workers = 1 if settings.DEBUG else settings.WORKERS
+    slots = get_generation_stats()["limit"]
+    print(f"Replicate slots per worker: {slots}")
+    if workers * slots > settings.MAX_CONCURRENT_GENERATIONS:
+        print(
+            f"Warning: {workers} workers x {slots} slot(s) allows "
+            f"{workers * slots} Replicate predictions in flight, above "
+            f"MAX_CONCURRENT_GENERATIONS={settings.MAX_CONCURRENT_GENERATIONS}. "
+            f"Set AI_SERVICE_WORKERS <= {settings.MAX_CONCURRENT_GENERATIONS} to keep the cap."
+        )
+
+    enhance_queue.start()
     yield
+    await enhance_queue.stop()
+    await close_http_client()
     print("Anchor AI Service shutting down...")
 
 
@@ -157,6 +236,7 @@ app = FastAPI(
     description="Structure-preserving sigil enhancement using ControlNet",
     version="1.0.0",
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,  # Fast serialization of large base64 payloads
 )
 
 # CORS middleware
@@ -168,24 +248,56 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Base64 image payloads are large; level 1 keeps compression cheap
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=1)
+
+
+# Thread pool for CPU-bound image work (OpenCV/NumPy/PIL release the GIL)
+_executor = ThreadPoolExecutor(max_workers=os.cpu_count())
+
 
 # ============================================================================
 # Utility Functions
 # ============================================================================
 
+async def run_blocking(func, *args, **kwargs):
+    """Run a blocking function in the thread pool without stalling the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, partial(func, *args, **kwargs))
+
+
 def decode_base64_image(base64_str: str) -> Image.Image:
     """Decode base64 string to PIL Image."""
-    if base64_str.startswith('data:'):
-        base64_str = base64_str.split(',')[1]
-    image_bytes = base64.b64decode(base64_str)
-    return Image.open(io.BytesIO(image_bytes))
+    return Image.open(io.BytesIO(base64_to_bytes(base64_str)))
 
 
-def encode_image_base64(image: Image.Image, format: str = "PNG") -> str:
-    """Encode PIL Image to base64 string."""
+# zlib level 1: much faster than PIL's default level 6, slightly larger output
+_PNG_ENCODE_PARAMS = [cv2.IMWRITE_PNG_COMPRESSION, 1]
+
+_CV2_FROM_PIL = {
+    'RGB': cv2.COLOR_RGB2BGR,
+    'RGBA': cv2.COLOR_RGBA2BGRA,
+}
+
+
+def encode_image_bytes(image: Image.Image, format: str = "PNG") -> bytes:
+    """Encode PIL Image to raw image file bytes."""
+    if format.upper() == "PNG" and image.mode in ('RGB', 'RGBA', 'L'):
+        array = np.asarray(image)
+        if image.mode in _CV2_FROM_PIL:
+            array = cv2.cvtColor(array, _CV2_FROM_PIL[image.mode])
+        ok, buf = cv2.imencode('.png', array, _PNG_ENCODE_PARAMS)
+        if ok:
+            return buf.tobytes()
+
     buffer = io.BytesIO()
     image.save(buffer, format=format)
-    return base64.b64encode(buffer.getvalue()).decode('utf-8')
+    return buffer.getvalue()
+
+
+def encode_image_base64(image: Image.Image, format: str = "PNG") -> str:
+    """Encode PIL Image to base64 string."""
+    return base64.b64encode(encode_image_bytes(image, format)).decode('utf-8')
 
 
 # ============================================================================
@@ -202,6 +314,17 @@ async def health_check():
     )
 
 
+@app.get("/metrics", response_model=MetricsResponse)
+async def get_metrics():
+    """Replicate saturation gauges for this worker, for monitoring back-pressure."""
+    stats = get_generation_stats()
+    return MetricsResponse(
+        generation_limit=stats["limit"],
+        generations_active=stats["active"],
+        generations_waiting=stats["waiting"],
+    )
+
+
 @app.get("/styles")
 async def get_available_styles():
     """Get available style presets with their configurations."""
@@ -226,7 +349,7 @@ async def preprocess_sigil(request: PreprocessRequest):
     - Padding/centering
     - Edge enhancement
     """
-    try:
+    def _preprocess_and_encode() -> PreprocessResponse:
         result = preprocess_control_image(request.sigil_svg)
 
         return PreprocessResponse(
@@ -236,6 +359,9 @@ async def preprocess_sigil(request: PreprocessRequest):
             processing_info=result.processing_info,
         )
 
+    try:
+        return await run_blocking(_preprocess_and_encode)
+
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -251,7 +377,7 @@ async def check_structure_match(request: StructureMatchRequest):
         original = decode_base64_image(request.original_mask_base64)
         generated = decode_base64_image(request.generated_image_base64)
 
-        result = compute_structure_match(original, generated)
+        result = await run_blocking(compute_structure_match, original, generated)
 
         return StructureMatchResponse(
             iou_score=result.iou_score,
@@ -272,7 +398,7 @@ async def composite_sigil(request: CompositeRequest):
 
     Guarantees 100% structure preservation.
     """
-    try:
+    def _composite_and_encode() -> CompositeResponse:
         generated = decode_base64_image(request.generated_image_base64)
 
         result = composite_original_lines(
@@ -289,10 +415,96 @@ async def composite_sigil(request: CompositeRequest):
             structure_guaranteed=result.structure_guaranteed,
         )
 
+    try:
+        return await run_blocking(_composite_and_encode)
+
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
+def _resolve_variation(
+    request: EnhanceRequest,
+    preprocess: ControlImageResult,
+    var: GenerationResult
+) -> tuple[Image.Image, dict]:
+    """
+    Composite a variation if needed and collect its result fields.
+
+    Returns:
+        Tuple of (final image, VariationResult fields except the image)
+    """
+    was_composited = False
+
+    # Auto-composite if enabled and structure drifted
+    if request.auto_composite and not var.structure_match.structure_preserved:
+        composite_result = composite_original_lines(
+            preprocess,
+            var.image,
+            style_name=request.style_choice,
+        )
+        final_image = composite_result.composite_image
+        was_composited = True
+
+        # Recompute structure match for composited image (should be ~1.0);
+        # the composite's strokes are exactly its blend mask
+        new_match = compute_structure_match(
+            preprocess.stroke_mask,
+            final_image,
+            generated_mask=composite_result.blend_mask,
+        )
+        structure_score = new_match.combined_score
+        structure_preserved = True
+        classification = "Structure Preserved (Composited)"
+    else:
+        final_image = var.image
+        structure_score = var.structure_match.combined_score
+        structure_preserved = var.structure_match.structure_preserved
+        classification = var.structure_match.classification
+
+    return final_image, {
+        "structure_match_score": var.structure_match.iou_score,
+        "edge_overlap_score": var.structure_match.edge_overlap_score,
+        "combined_score": structure_score,
+        "structure_preserved": structure_preserved,
+        "classification": classification,
+        "was_composited": was_composited,
+        "seed": var.seed,
+    }
+
+
+def _finalize_variation(
+    request: EnhanceRequest,
+    preprocess: ControlImageResult,
+    var: GenerationResult
+) -> VariationResult:
+    """
+    Composite (if needed) and encode a single variation.
+
+    Runs synchronously; call through run_blocking so variations are
+    composited and PNG-encoded in parallel.
+    """
+    final_image, fields = _resolve_variation(request, preprocess, var)
+    return VariationResult(image_base64=encode_image_base64(final_image), **fields)
+
+
+def _encode_multipart_part(
+    request: EnhanceRequest,
+    preprocess: ControlImageResult,
+    var: GenerationResult,
+    boundary: str
+) -> bytes:
+    """Build one multipart/mixed part (PNG body, scores as X- headers)."""
+    final_image, fields = _resolve_variation(request, preprocess, var)
+
+    headers = [f"--{boundary}", "Content-Type: image/png"]
+    for name, value in fields.items():
+        header_name = "X-" + "-".join(word.capitalize() for word in name.split("_"))
+        headers.append(f"{header_name}: {value}")
+
+    head = ("\r\n".join(headers) + "\r\n\r\n").encode('utf-8')
+    return head + encode_image_bytes(final_image) + b"\r\n"
+
+
 @app.post("/enhance", response_model=EnhanceResponse)
 async def enhance_sigil(request: EnhanceRequest):
     """
@@ -309,55 +521,30 @@ async def enhance_sigil(request: EnhanceRequest):
         )
 
     try:
-        # Generate variations
-        result = await generate_with_auto_retry(
-            request.sigil_svg,
-            request.style_choice,
-            num_variations=request.num_variations,
-            min_passing=2,
+        # Generate variations (batched with concurrent identical-sigil requests)
+        result = await enhance_queue.add_request(
+            (request.sigil_svg, request.style_choice),
+            request.num_variations,
         )
 
-        # Process variations
-        variations = []
-        for i, var in enumerate(result.variations):
-            was_composited = False
-
-            # Auto-composite if enabled and structure drifted
-            if request.auto_composite and not var.structure_match.structure_preserved:
-                composite_result = composite_original_lines(
-                    request.sigil_svg,
-                    var.image,
-                    style_name=request.style_choice,
-                )
-                final_image = composite_result.composite_image
-                was_composited = True
-
-                # Recompute structure match for composited image (should be ~1.0)
-                new_match = compute_structure_match(result.stroke_mask, final_image)
-                structure_score = new_match.combined_score
-                structure_preserved = True
-                classification = "Structure Preserved (Composited)"
-            else:
-                final_image = var.image
-                structure_score = var.structure_match.combined_score
-                structure_preserved = var.structure_match.structure_preserved
-                classification = var.structure_match.classification
-
-            variations.append(VariationResult(
-                image_base64=encode_image_base64(final_image),
-                structure_match_score=var.structure_match.iou_score,
-                edge_overlap_score=var.structure_match.edge_overlap_score,
-                combined_score=structure_score,
-                structure_preserved=structure_preserved,
-                classification=classification,
-                was_composited=was_composited,
-                seed=var.seed,
-            ))
+        # Cached - same preprocessing the generator just ran; shared by
+        # every variation that needs compositing. Off the loop in case of
+        # a cache miss.
+        preprocess = await run_blocking(preprocess_control_image, request.sigil_svg)
+
+        # Composite/encode variations in parallel off the event loop
+        control_image_base64, *variations = await asyncio.gather(
+            run_blocking(encode_image_base64, result.control_image),
+            *[
+                run_blocking(_finalize_variation, request, preprocess, var)
+                for var in result.variations
+            ],
+        )
 
         return EnhanceResponse(
             success=True,
             variations=variations,
-            control_image_base64=encode_image_base64(result.control_image),
+            control_image_base64=control_image_base64,
             style_applied=result.style_applied,
             prompt_used=result.prompt_used,
             negative_prompt_used=result.negative_prompt_used,
@@ -371,6 +558,48 @@ async def enhance_sigil(request: EnhanceRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/enhance/stream")
+async def enhance_sigil_stream(request: EnhanceRequest):
+    """
+    Streaming enhancement endpoint.
+
+    Emits each variation as a multipart/mixed part (raw PNG, no base64) as
+    soon as it finishes generating. Scores are sent as X- part headers.
+    Variations arrive in completion order and are not retried.
+    """
+    # Validate style
+    if request.style_choice not in STYLE_PRESETS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid style. Available: {list(STYLE_PRESETS.keys())}"
+        )
+
+    boundary = uuid.uuid4().hex
+
+    async def stream_parts():
+        # Preprocess off the loop; the generator below reuses the cached result
+        preprocess = await run_blocking(preprocess_control_image, request.sigil_svg)
+
+        async for var in iter_styled_variations(
+            request.sigil_svg,
+            request.style_choice,
+            num_variations=request.num_variations,
+        ):
+            yield await run_blocking(
+                _encode_multipart_part, request, preprocess, var, boundary
+            )
+
+        yield f"--{boundary}--\r\n".encode('utf-8')
+
+    return StreamingResponse(
+        stream_parts(),
+        media_type=f"multipart/mixed; boundary={boundary}",
+        # PNG parts are already compressed, and GZipMiddleware would buffer
+        # parts instead of flushing them; identity makes it pass through
+        headers={"Content-Encoding": "identity"},
+    )
+
+
 # ============================================================================
 # Main Entry Point
 # ============================================================================
@@ -383,6 +612,9 @@ def main():
         host=settings.HOST,
         port=settings.PORT,
         reload=settings.DEBUG,
+        workers=1 if settings.DEBUG else settings.WORKERS,
+        loop="auto",
+        http="auto",
     )
 
 
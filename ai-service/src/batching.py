@@ -0,0 +1,131 @@
+"""
+Anchor AI Service - Request Batching Module
+Micro-batches concurrent requests so they can share a single upstream call.
+
+Requests are collected for a short window (or until the batch is full),
+grouped by key, and each group is handed to a single process function.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+
+# process_fn(key, payloads) -> results aligned with payloads
+BatchProcessFn = Callable[[Hashable, list[Any]], Awaitable[list[Any]]]
+
+
+class AsyncBatchQueue:
+    """asyncio.Queue-backed collector that fuses requests sharing a key."""
+
+    def __init__(
+        self,
+        process_fn: BatchProcessFn,
+        max_batch_size: int = 8,
+        max_wait_time: float = 0.05
+    ):
+        """
+        Args:
+            process_fn: Coroutine called once per key group in a batch
+            max_batch_size: Maximum requests collected into one batch
+            max_wait_time: Seconds to wait for more requests after the first
+        """
+        self.process_fn = process_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait_time = max_wait_time
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker_task: Optional[asyncio.Task] = None
+        self._group_tasks: set[asyncio.Task] = set()
+
+    @property
+    def running(self) -> bool:
+        return self._worker_task is not None and not self._worker_task.done()
+
+    def start(self) -> None:
+        """Start the batching worker on the running event loop."""
+        if self.running:
+            return
+        self._queue = asyncio.Queue()
+        self._worker_task = asyncio.create_task(self._worker())
+
+    async def stop(self) -> None:
+        """Stop the worker and wait for in-flight groups to finish."""
+        if self._worker_task is not None:
+            self._worker_task.cancel()
+            try:
+                await self._worker_task
+            except asyncio.CancelledError:
+                pass
+            self._worker_task = None
+
+        if self._group_tasks:
+            await asyncio.gather(*self._group_tasks, return_exceptions=True)
+
+    async def add_request(self, key: Hashable, payload: Any) -> Any:
+        """
+        Submit a request and wait for its result.
+
+        Args:
+            key: Requests with equal keys are processed together
+            payload: Per-request data passed to process_fn
+
+        Returns:
+            The result produced for this payload
+        """
+        if not self.running:
+            raise RuntimeError("AsyncBatchQueue is not running")
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((key, payload, future))
+        return await future
+
+    async def _collect_batch(self) -> list[tuple]:
+        """Wait for one request, then gather more until full or timed out."""
+        batch = [await self._queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_wait_time
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+
+        return batch
+
+    async def _worker(self) -> None:
+        """Collect batches and dispatch one task per key group."""
+        while True:
+            batch = await self._collect_batch()
+
+            groups: dict[Hashable, list[tuple]] = {}
+            for key, payload, future in batch:
+                groups.setdefault(key, []).append((payload, future))
+
+            for key, items in groups.items():
+                task = asyncio.create_task(self._process_group(key, items))
+                self._group_tasks.add(task)
+                task.add_done_callback(self._group_tasks.discard)
+
+    async def _process_group(self, key: Hashable, items: list[tuple]) -> None:
+        """Run process_fn for a group and resolve each request's future."""
+        payloads = [payload for payload, _ in items]
+
+        try:
+            results = await self.process_fn(key, payloads)
+            if len(results) != len(items):
+                raise ValueError(
+                    f"process_fn returned {len(results)} results for {len(items)} requests"
+                )
+        except Exception as e:
+            for _, future in items:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), result in zip(items, results):
+            if not future.done():
+                future.set_result(result)
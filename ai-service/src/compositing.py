@@ -11,12 +11,18 @@ This guarantees 100% structure preservation at the cost of some artistic freedom
 """
 
 import numpy as np
-from PIL import Image, ImageFilter, ImageDraw
+from PIL import Image, ImageDraw
 import cv2
 from typing import Tuple, Optional
 from dataclasses import dataclass
 
-from .preprocessing import preprocess_control_image, create_dilated_mask
+try:
+    from numba import njit, types
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
+from .preprocessing import preprocess_control_image, create_dilated_mask, ControlImageResult
 
 
 @dataclass
@@ -30,10 +36,62 @@ class CompositeResult:
     structure_guaranteed: bool         # Always True for composited images
 
 
+def _pil_resize_fast(
+    image: Image.Image,
+    size: Tuple[int, int]
+) -> Image.Image:
+    """
+    Resize a PIL image with OpenCV (SIMD) instead of PIL's scalar Lanczos.
+
+    Uses INTER_AREA when shrinking and INTER_LANCZOS4 when enlarging.
+    Returns the input unchanged if it is already the requested size.
+    """
+    if image.size == tuple(size):
+        return image
+
+    if image.mode not in ('L', 'RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+
+    width, height = image.size
+    shrinking = size[0] <= width and size[1] <= height
+    interpolation = cv2.INTER_AREA if shrinking else cv2.INTER_LANCZOS4
+
+    resized = cv2.resize(np.asarray(image), tuple(size), interpolation=interpolation)
+    return Image.fromarray(resized)
+
+
+def feather_mask(
+    mask: Image.Image,
+    radius: float = 2.0
+) -> Image.Image:
+    """
+    Feather mask edges with a Gaussian blur.
+
+    Uses OpenCV's SIMD Gaussian (sigma = radius, matching PIL's GaussianBlur)
+    so a single feathered mask can be computed once and shared.
+
+    Args:
+        mask: Binary stroke mask
+        radius: Blur sigma in pixels
+
+    Returns:
+        Feathered grayscale mask
+    """
+    if mask.mode != 'L':
+        mask = mask.convert('L')
+
+    if radius <= 0:
+        return mask
+
+    blurred = cv2.GaussianBlur(np.asarray(mask), (0, 0), sigmaX=radius)
+    return Image.fromarray(blurred)
+
+
 def extract_sigil_with_alpha(
     control_image: Image.Image,
     stroke_mask: Image.Image,
-    edge_feather_px: int = 2
+    edge_feather_px: int = 2,
+    feathered_mask: Optional[Image.Image] = None
 ) -> Image.Image:
     """
     Create sigil layer with alpha channel for blending.
@@ -42,19 +100,16 @@ def extract_sigil_with_alpha(
         control_image: High-contrast control image (white strokes on black)
         stroke_mask: Binary mask of stroke regions
         edge_feather_px: Pixels to feather at edges for smooth blending
+        feathered_mask: Precomputed feathered mask (skips the blur)
 
     Returns:
         RGBA image with sigil and transparency
     """
-    # Convert mask to grayscale if needed
-    if stroke_mask.mode != 'L':
-        mask = stroke_mask.convert('L')
-    else:
-        mask = stroke_mask
-
     # Feather edges for smooth blending
-    if edge_feather_px > 0:
-        mask = mask.filter(ImageFilter.GaussianBlur(radius=edge_feather_px))
+    if feathered_mask is not None:
+        mask = feathered_mask
+    else:
+        mask = feather_mask(stroke_mask, edge_feather_px)
 
     # Create RGBA with white sigil and mask as alpha
     if control_image.mode == 'RGB':
@@ -68,9 +123,10 @@ def extract_sigil_with_alpha(
 
 
 def inpaint_background(
-    generated_image: Image.Image,
-    dilated_mask: Image.Image,
-    inpaint_radius: int = 5
+    generated_image: Image.Image | np.ndarray,
+    dilated_mask: Image.Image | np.ndarray,
+    inpaint_radius: int = 5,
+    downscale: int = 4
 ) -> Image.Image:
     """
     Inpaint the sigil area in generated image to create clean background.
@@ -78,32 +134,132 @@ def inpaint_background(
     This removes any AI-generated sigil interpretation from the background,
     preparing it for compositing with the original sigil.
 
+    Telea inpainting cost scales with pixel count, so it runs on a
+    downscaled copy; the masked region is low-frequency background and is
+    upsampled and pasted back, leaving pixels outside the mask untouched.
+
     Args:
-        generated_image: AI-generated image
-        dilated_mask: Mask of sigil area to inpaint
-        inpaint_radius: Radius for inpainting algorithm
+        generated_image: AI-generated image (PIL or RGB uint8 array)
+        dilated_mask: Mask of sigil area to inpaint (PIL or uint8 array)
+        inpaint_radius: Radius for inpainting algorithm (full-resolution px)
+        downscale: Downscale factor for the inpaint pass (1 = full resolution)
 
     Returns:
         Image with sigil area inpainted
     """
-    # Convert to numpy
-    img_array = np.array(generated_image.convert('RGB'))
-
-    # Ensure mask is correct format
+    if isinstance(generated_image, Image.Image):
+        generated_image = np.asarray(generated_image.convert('RGB'))
     if isinstance(dilated_mask, Image.Image):
-        mask_array = np.array(dilated_mask.convert('L'))
-    else:
-        mask_array = dilated_mask
+        dilated_mask = np.asarray(dilated_mask.convert('L'))
+
+    inpainted = _inpaint_array(generated_image, dilated_mask, inpaint_radius, downscale)
+    return Image.fromarray(inpainted)
+
+
+def _inpaint_array(
+    img_array: np.ndarray,
+    mask_array: np.ndarray,
+    inpaint_radius: int = 5,
+    downscale: int = 4
+) -> np.ndarray:
+    """Array implementation of inpaint_background; never modifies its inputs."""
+    height, width = mask_array.shape[:2]
+
+    if downscale <= 1 or min(height, width) < downscale * 64:
+        # Small image - inpaint at full resolution
+        return cv2.inpaint(
+            img_array,
+            mask_array,
+            inpaint_radius,
+            cv2.INPAINT_TELEA
+        )
+
+    small_size = (width // downscale, height // downscale)
+    small_image = cv2.resize(img_array, small_size, interpolation=cv2.INTER_AREA)
+
+    # INTER_AREA + "> 0" keeps any partially covered pixel in the mask
+    small_mask = cv2.resize(mask_array, small_size, interpolation=cv2.INTER_AREA)
+    small_mask = np.where(small_mask > 0, np.uint8(255), np.uint8(0))
 
     # Inpaint using OpenCV's Telea algorithm
-    inpainted = cv2.inpaint(
-        img_array,
-        mask_array,
-        inpaint_radius,
+    small_inpainted = cv2.inpaint(
+        small_image,
+        small_mask,
+        max(1, inpaint_radius // downscale),
         cv2.INPAINT_TELEA
     )
 
-    return Image.fromarray(inpainted)
+    upscaled = cv2.resize(
+        small_inpainted,
+        (width, height),
+        interpolation=cv2.INTER_LANCZOS4
+    )
+
+    # Only replace pixels inside the mask
+    inside = mask_array > 0
+    result = img_array.copy()
+    result[inside] = upscaled[inside]
+
+    return result
+
+
+if HAS_NUMBA:
+    # Explicit signature: compiled (or loaded from cache) at import, not on
+    # the first request. (sigil, texture, strength, out) over C-contiguous
+    # float32 HxWx3 arrays.
+    _BLEND_SIGNATURE = "void(f4[:, :, ::1], f4[:, :, ::1], f8, f4[:, :, ::1])"
+
+    @njit(_BLEND_SIGNATURE, fastmath=True, cache=True)
+    def _overlay_blend(sigil, texture, strength, out):
+        """Fused overlay blend + strength mix over float32 HxWx3 arrays."""
+        height, width, channels = sigil.shape
+        keep = 1.0 - strength
+        for i in range(height):
+            for j in range(width):
+                for c in range(channels):
+                    s = sigil[i, j, c]
+                    t = texture[i, j, c]
+                    if s < 0.5:
+                        b = 2.0 * s * t
+                    else:
+                        b = 1.0 - 2.0 * (1.0 - s) * (1.0 - t)
+                    out[i, j, c] = s * keep + b * strength
+
+    @njit(_BLEND_SIGNATURE, fastmath=True, cache=True)
+    def _soft_light_blend(sigil, texture, strength, out):
+        """Fused soft-light blend + strength mix over float32 HxWx3 arrays."""
+        height, width, channels = sigil.shape
+        keep = 1.0 - strength
+        for i in range(height):
+            for j in range(width):
+                for c in range(channels):
+                    s = sigil[i, j, c]
+                    t = texture[i, j, c]
+                    b = s * (s + 2.0 * t * (1.0 - s))
+                    out[i, j, c] = s * keep + b * strength
+
+    # (background, alpha, alpha_scale, color, out); background/alpha come
+    # straight from PIL, so accept read-only views as well
+    _U8_RGB = (types.Array(types.uint8, 3, 'C'), types.Array(types.uint8, 3, 'C', readonly=True))
+    _U8_GRAY = (types.Array(types.uint8, 2, 'C'), types.Array(types.uint8, 2, 'C', readonly=True))
+
+    @njit(
+        [
+            types.void(bg, a, types.float32, types.Array(types.float32, 1, 'C'), _U8_RGB[0])
+            for bg in _U8_RGB for a in _U8_GRAY
+        ],
+        cache=True
+    )
+    def _alpha_composite_u8(background, alpha, alpha_scale, color, out):
+        """Fused uint8 alpha blend: out = bg + a * (color - bg), rounded and saturated."""
+        height, width, channels = background.shape
+        for i in range(height):
+            for j in range(width):
+                a = np.float32(alpha[i, j]) * alpha_scale
+                for c in range(channels):
+                    bg = np.float32(background[i, j, c])
+                    v = np.rint(bg + a * (color[c] - bg))
+                    out[i, j, c] = min(max(v, 0.0), 255.0)
 
 
 def apply_sigil_texture(
@@ -127,37 +283,59 @@ def apply_sigil_texture(
         Sigil with applied texture
     """
     # Resize texture source to match sigil
-    texture = texture_source.resize(sigil_image.size, Image.Resampling.LANCZOS)
+    texture = _pil_resize_fast(texture_source, sigil_image.size)
+
+    # Convert to float32 [0, 1] for blending (half the bytes of float64)
+    sigil_array = np.asarray(sigil_image.convert('RGB'), dtype=np.float32) * np.float32(1 / 255.0)
+    texture_array = np.asarray(texture.convert('RGB'), dtype=np.float32) * np.float32(1 / 255.0)
 
-    # Convert to numpy for blending
-    sigil_array = np.array(sigil_image.convert('RGB')).astype(float) / 255.0
-    texture_array = np.array(texture.convert('RGB')).astype(float) / 255.0
+    strength = float(texture_strength)
+    blended = np.empty_like(sigil_array)
 
     if blend_mode == "multiply":
         # Multiply blend: darken where texture is dark
-        blended = sigil_array * (1 - texture_strength) + sigil_array * texture_array * texture_strength
-
-    elif blend_mode == "overlay":
-        # Overlay: increase contrast
-        mask = sigil_array < 0.5
-        blended = np.where(
-            mask,
-            2 * sigil_array * texture_array,
-            1 - 2 * (1 - sigil_array) * (1 - texture_array)
-        )
-        blended = sigil_array * (1 - texture_strength) + blended * texture_strength
-
-    elif blend_mode == "soft_light":
-        # Soft light: gentler overlay
-        blended = (1 - 2 * texture_array) * sigil_array ** 2 + 2 * texture_array * sigil_array
-        blended = sigil_array * (1 - texture_strength) + blended * texture_strength
+        # s * (1 - k) + s * t * k == s * ((1 - k) + t * k)
+        np.multiply(texture_array, np.float32(strength), out=blended)
+        blended += np.float32(1 - strength)
+        blended *= sigil_array
+
+    elif blend_mode in ("overlay", "soft_light") and HAS_NUMBA:
+        # Single fused pass, no temporaries (serial: callers already run in worker threads)
+        if blend_mode == "overlay":
+            _overlay_blend(sigil_array, texture_array, strength, blended)
+        else:
+            _soft_light_blend(sigil_array, texture_array, strength, blended)
+
+    elif blend_mode in ("overlay", "soft_light"):
+        if blend_mode == "overlay":
+            # Overlay: increase contrast
+            # 2st where s < 0.5, else 1 - 2(1 - s)(1 - t)
+            mask = sigil_array < 0.5
+            screen = np.subtract(1, sigil_array, dtype=np.float32)
+            screen *= np.subtract(1, texture_array, dtype=np.float32)
+            screen *= -2
+            screen += 1
+            np.multiply(sigil_array, texture_array, out=blended)
+            blended *= 2
+            np.copyto(blended, screen, where=~mask)
+        else:
+            # Soft light: gentler overlay
+            # (1 - 2t)s^2 + 2ts == s * (s + 2t(1 - s))
+            np.subtract(1, sigil_array, out=blended)
+            blended *= texture_array
+            blended *= 2
+            blended += sigil_array
+            blended *= sigil_array
+
+        # Mix with the original sigil by texture strength
+        cv2.addWeighted(sigil_array, 1 - strength, blended, strength, 0, dst=blended)
 
     else:
         # Default: simple blend
-        blended = sigil_array * (1 - texture_strength) + texture_array * texture_strength
+        cv2.addWeighted(sigil_array, 1 - strength, texture_array, strength, 0, dst=blended)
 
-    # Clip and convert back
-    blended = np.clip(blended * 255, 0, 255).astype(np.uint8)
+    # Scale, saturate and convert back to uint8 in one SIMD pass
+    blended = cv2.convertScaleAbs(blended, alpha=255.0)
 
     return Image.fromarray(blended)
 
@@ -168,7 +346,8 @@ def composite_sigil_on_background(
     generated_background: Image.Image,
     sigil_color: Tuple[int, int, int] | None = None,
     edge_feather: int = 2,
-    opacity: float = 1.0
+    opacity: float = 1.0,
+    feathered_mask: Optional[Image.Image] = None
 ) -> Image.Image:
     """
     Composite original sigil strokes onto AI-generated background.
@@ -180,14 +359,15 @@ def composite_sigil_on_background(
         sigil_color: Optional color for sigil (None = sample from generated)
         edge_feather: Pixels to feather edges
         opacity: Overall opacity of sigil layer (0-1)
+        feathered_mask: Precomputed feathered mask (skips the blur)
 
     Returns:
         Composited image with original sigil geometry on styled background
     """
     # Ensure same size
     size = generated_background.size
-    original_sigil = original_sigil.resize(size, Image.Resampling.LANCZOS)
-    stroke_mask = stroke_mask.resize(size, Image.Resampling.LANCZOS)
+    original_sigil = _pil_resize_fast(original_sigil, size)
+    stroke_mask = _pil_resize_fast(stroke_mask, size)
 
     # Convert mask to L mode
     if stroke_mask.mode != 'L':
@@ -198,44 +378,61 @@ def composite_sigil_on_background(
         # Sample dominant color from generated image sigil region
         sigil_color = _sample_sigil_color(generated_background, stroke_mask)
 
-    # Create colored sigil layer
-    sigil_colored = Image.new('RGB', size, sigil_color)
-
     # Feather the mask for smooth edges
-    if edge_feather > 0:
-        alpha_mask = stroke_mask.filter(ImageFilter.GaussianBlur(radius=edge_feather))
+    if feathered_mask is not None and feathered_mask.size == size:
+        alpha_mask = feathered_mask
     else:
-        alpha_mask = stroke_mask
+        alpha_mask = feather_mask(stroke_mask, edge_feather)
+
+    # Fused alpha blend: out = bg + a * (color - bg), opacity folded into a
+    alpha_scale = np.float32(opacity / 255.0)
+    color = np.asarray(sigil_color, dtype=np.float32)
+
+    if HAS_NUMBA:
+        # Single pass from uint8 to uint8, no float32 HxWx3 temporaries
+        background = np.asarray(generated_background.convert('RGB'))
+        composite = np.empty_like(background)
+        _alpha_composite_u8(
+            background, np.asarray(alpha_mask), alpha_scale, color, composite
+        )
+        return Image.fromarray(composite)
 
-    # Apply opacity
-    if opacity < 1.0:
-        alpha_array = np.array(alpha_mask).astype(float) * opacity
-        alpha_mask = Image.fromarray(alpha_array.astype(np.uint8))
+    alpha = np.asarray(alpha_mask, dtype=np.float32)
+    alpha *= alpha_scale
+    background = np.asarray(generated_background.convert('RGB'), dtype=np.float32)
 
-    # Composite using alpha mask
-    result = Image.composite(sigil_colored, generated_background, alpha_mask)
+    blended = color - background
+    blended *= alpha[:, :, None]
+    blended += background
 
-    return result
+    return Image.fromarray(cv2.convertScaleAbs(blended))
 
 
 def _sample_sigil_color(
-    image: Image.Image,
-    mask: Image.Image,
+    image: Image.Image | np.ndarray,
+    mask: Image.Image | np.ndarray,
     method: str = "dominant"
 ) -> Tuple[int, int, int]:
     """
     Sample color from image within masked region.
 
     Args:
-        image: Source image
-        mask: Region to sample from
+        image: Source image (PIL or RGB uint8 array)
+        mask: Region to sample from (PIL or uint8 array)
         method: "dominant" for most common, "mean" for average
 
     Returns:
         RGB color tuple
     """
-    img_array = np.array(image.convert('RGB'))
-    mask_array = np.array(mask.convert('L'))
+    if isinstance(image, Image.Image):
+        img_array = np.asarray(image.convert('RGB'))
+    else:
+        img_array = image
+
+    if isinstance(mask, Image.Image):
+        mask_array = np.asarray(mask.convert('L'))
+    else:
+        mask_array = mask
 
     # Get pixels within mask
     masked_pixels = img_array[mask_array > 127]
@@ -244,20 +441,20 @@ def _sample_sigil_color(
         return (255, 255, 255)  # Default to white
 
     if method == "mean":
-        color = masked_pixels.mean(axis=0).astype(int)
+        color = masked_pixels.mean(axis=0, dtype=np.float32).astype(int)
     else:
         # Find dominant color using histogram
-        from collections import Counter
-        # Quantize to reduce unique colors
-        quantized = (masked_pixels // 32) * 32
-        pixel_tuples = [tuple(p) for p in quantized]
-        color = Counter(pixel_tuples).most_common(1)[0][0]
+        # Quantize to 3 bits per channel and pack RGB into one 9-bit key
+        quantized = masked_pixels.astype(np.uint32) >> 5
+        keys = (quantized[:, 0] << 6) | (quantized[:, 1] << 3) | quantized[:, 2]
+        best = int(np.bincount(keys, minlength=512).argmax())
+        color = (((best >> 6) & 7) << 5, ((best >> 3) & 7) << 5, (best & 7) << 5)
 
     return tuple(color)
 
 
 def composite_original_lines(
-    original_svg_or_image: str | Image.Image,
+    original_svg_or_image: str | Image.Image | ControlImageResult,
     generated_image: Image.Image,
     style_name: str = "watercolor",
     blend_texture: bool = True,
@@ -271,7 +468,8 @@ def composite_original_lines(
     optionally sampling texture from the generated image.
 
     Args:
-        original_svg_or_image: Original sigil (SVG string or PIL Image)
+        original_svg_or_image: Original sigil (SVG string or PIL Image), or an
+            existing ControlImageResult to skip preprocessing
         generated_image: AI-generated styled image
         style_name: Style being applied (affects color sampling)
         blend_texture: Whether to apply texture to sigil strokes
@@ -281,20 +479,34 @@ def composite_original_lines(
         CompositeResult with composited image and component layers
     """
     # Preprocess original to get control image and masks
-    preprocess_result = preprocess_control_image(original_svg_or_image)
+    if isinstance(original_svg_or_image, ControlImageResult):
+        preprocess_result = original_svg_or_image
+    else:
+        preprocess_result = preprocess_control_image(original_svg_or_image)
 
     control_image = preprocess_result.control_image
     stroke_mask = preprocess_result.stroke_mask
     dilated_mask = preprocess_result.dilated_mask
 
     # Resize generated image to match
-    generated = generated_image.resize(
-        control_image.size,
-        Image.Resampling.LANCZOS
-    )
+    generated = _pil_resize_fast(generated_image, control_image.size)
+
+    # Convert to arrays once; shared by inpainting and color sampling
+    generated_rgb = np.asarray(generated.convert('RGB'))
+    stroke_mask_l = np.asarray(stroke_mask.convert('L'))
+    dilated_mask_l = np.asarray(dilated_mask.convert('L'))
+
+    # Feather the stroke mask once; shared by all compositing helpers
+    feathered_mask = feather_mask(stroke_mask, radius=2.0)
+
+    # Create background with sigil area inpainted. Always needed: the
+    # dilated border around the strokes stays visible in the composite,
+    # and background_only is returned to callers.
+    background_array = _inpaint_array(generated_rgb, dilated_mask_l)
+    background = Image.fromarray(background_array)
 
-    # Create background with sigil area inpainted
-    background = inpaint_background(generated, dilated_mask)
+    # Sample sigil color from the inpainted background
+    sigil_color = _sample_sigil_color(background_array, stroke_mask_l)
 
     # Optionally apply texture to sigil
     if blend_texture:
@@ -312,9 +524,10 @@ def composite_original_lines(
         sigil_layer,
         stroke_mask,
         background,
-        sigil_color=None,  # Sample from generated
+        sigil_color=sigil_color,
         edge_feather=2,
-        opacity=1.0
+        opacity=1.0,
+        feathered_mask=feathered_mask
     )
 
     return CompositeResult(
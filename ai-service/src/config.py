@@ -4,13 +4,18 @@ Centralized configuration for sigil geometry preservation pipeline.
 """
 
 import os
-from typing import Dict, Any
-from pydantic import BaseModel
+import sys
+from types import MappingProxyType
+from typing import Dict, Any, Mapping
+from pydantic import BaseModel, ConfigDict, Field
+from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
 class ControlNetConfig(BaseModel):
     """ControlNet parameters optimized for structure preservation."""
 
+    model_config = ConfigDict(frozen=True)
+
     # CRITICAL: Higher values = better structure preservation
     # We use aggressive values since structure is non-negotiable
     conditioning_scale: float = 1.15  # Was 0.8 - now 1.15 for strict adherence
@@ -31,6 +36,8 @@ class ControlNetConfig(BaseModel):
 class PreprocessConfig(BaseModel):
     """Preprocessing configuration for control image generation."""
 
+    model_config = ConfigDict(frozen=True)
+
     # Output dimensions (SDXL optimal)
     output_size: int = 1024
 
@@ -52,6 +59,8 @@ class PreprocessConfig(BaseModel):
 class StructureMatchConfig(BaseModel):
     """Configuration for structure preservation validation."""
 
+    model_config = ConfigDict(frozen=True)
+
     # IoU threshold for "structure preserved" badge
     iou_threshold: float = 0.85       # 85%+ pixel overlap required
 
@@ -69,6 +78,8 @@ class StructureMatchConfig(BaseModel):
 class StylePreset(BaseModel):
     """Style-specific configuration."""
 
+    model_config = ConfigDict(frozen=True)
+
     name: str
     controlnet_type: str  # 'lineart', 'canny', 'scribble'
     prompt_template: str
@@ -191,19 +202,46 @@ STYLE_PRESETS: Dict[str, StylePreset] = {
     ),
 }
 
+# Read-only after import; style names interned for identity-fast lookups
+STYLE_PRESETS: Mapping[str, StylePreset] = MappingProxyType(
+    {sys.intern(name): preset for name, preset in STYLE_PRESETS.items()}
+)
 
-# Environment configuration
-class Settings:
-    """Application settings from environment."""
 
-    REPLICATE_API_TOKEN: str = os.getenv("REPLICATE_API_TOKEN", "")
-    HOST: str = os.getenv("AI_SERVICE_HOST", "0.0.0.0")
-    PORT: int = int(os.getenv("AI_SERVICE_PORT", "8001"))
-    DEBUG: bool = os.getenv("AI_SERVICE_DEBUG", "false").lower() == "true"
+# Environment configuration
+class Settings(BaseSettings):
+    """Application settings from environment (read once at import)."""
+
+    model_config = SettingsConfigDict(
+        frozen=True,
+        defer_build=True,
+        env_file=".env",
+        env_prefix="",
+        case_sensitive=False,
+        extra="ignore",
+    )
+
+    REPLICATE_API_TOKEN: str = ""
+    HOST: str = Field("0.0.0.0", validation_alias="AI_SERVICE_HOST")
+    PORT: int = Field(8001, validation_alias="AI_SERVICE_PORT")
+    DEBUG: bool = Field(False, validation_alias="AI_SERVICE_DEBUG")
+
+    # Uvicorn worker processes (ignored in debug/reload mode). One per core:
+    # preprocessing is CPU-bound and each worker has its own thread pools
+    WORKERS: int = Field(
+        os.cpu_count() or 1,
+        validation_alias="AI_SERVICE_WORKERS",
+    )
 
     # ControlNet model selection
     # Options: 'replicate' (cloud), 'local' (requires GPU)
-    INFERENCE_MODE: str = os.getenv("INFERENCE_MODE", "replicate")
+    INFERENCE_MODE: str = "replicate"
+
+    # Back-pressure: max generation jobs in flight against Replicate
+    MAX_CONCURRENT_GENERATIONS: int = 5
+
+    # Preprocessing results cached per worker process (~5 MB each; 0 disables)
+    PREPROCESS_CACHE_SIZE: int = Field(16, ge=0)
 
     # Replicate model IDs
     CONTROLNET_LINEART_MODEL: str = "jagilley/controlnet-scribble:435061a1b5a4c1e26740464bf786efdfa9cb3a3ac488595a2de23e143fdb0117"
@@ -13,13 +13,28 @@ import asyncio
 import base64
 import io
 import os
-from typing import Optional
-from dataclasses import dataclass
+import time
 from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import lru_cache, partial
+from typing import AsyncIterator, Optional, Sequence
+from dataclasses import dataclass
 
 from PIL import Image
 import httpx
 
+try:
+    import h2  # noqa: F401 - enables HTTP/2 in httpx
+    HAS_H2 = True
+except ImportError:
+    HAS_H2 = False
+
+try:
+    import replicate
+    HAS_REPLICATE = True
+except ImportError:
+    HAS_REPLICATE = False
+
 from .config import (
     settings,
     controlnet_config,
@@ -27,11 +42,11 @@ from .config import (
     StylePreset,
     ControlNetConfig,
 )
-from .preprocessing import preprocess_control_image, image_to_base64, ControlImageResult
+from .preprocessing import preprocess_control_image, ControlImageResult
 from .structure_matching import compute_structure_match, StructureMatchResult
 
 
-@dataclass
+@dataclass(slots=True)
 class GenerationResult:
     """Result from single variation generation."""
 
@@ -41,11 +56,11 @@ class GenerationResult:
     generation_time_ms: int             # Time to generate
 
 
-@dataclass
+@dataclass(slots=True)
 class StyledVariationsResult:
     """Result from generating all styled variations."""
 
-    variations: list[GenerationResult]  # All generated variations
+    variations: Sequence[GenerationResult]  # All generated variations (tuple)
     control_image: Image.Image          # Control image used
     stroke_mask: Image.Image            # Original stroke mask
     style_applied: str                  # Style name
@@ -56,19 +71,105 @@ class StyledVariationsResult:
     best_variation_index: int           # Index of highest scoring variation
 
 
-# Thread pool for parallel generation
-_executor = ThreadPoolExecutor(max_workers=4)
+# Shared HTTP client for downloading generated images (keep-alive across variations)
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def _get_http_client() -> httpx.AsyncClient:
+    """Get the shared HTTP client, creating it on first use."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            http2=HAS_H2,
+            limits=httpx.Limits(max_connections=32, max_keepalive_connections=16),
+            timeout=60.0,
+        )
+    return _http_client
+
+
+async def close_http_client() -> None:
+    """Close the shared HTTP client (call on shutdown)."""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+# Replicate client singleton (created on first use)
+_replicate_client = None
 
 
 def _get_replicate_client():
     """Get Replicate client with API token."""
+    global _replicate_client
+    if _replicate_client is None:
+        if not HAS_REPLICATE:
+            raise ImportError("replicate package required. Install with: pip install replicate")
+        _replicate_client = replicate.Client(api_token=settings.REPLICATE_API_TOKEN)
+    return _replicate_client
+
+
+# Back-pressure for Replicate: MAX_CONCURRENT_GENERATIONS is split evenly
+# across uvicorn worker processes, with a floor of one slot per worker (so
+# the total exceeds the setting when WORKERS > MAX_CONCURRENT_GENERATIONS)
+GENERATION_LIMIT = max(
+    1,
+    settings.MAX_CONCURRENT_GENERATIONS // (1 if settings.DEBUG else settings.WORKERS),
+)
+
+# Blocking replicate client calls get their own pool, sized to the slot
+# limit, so they never compete with to_thread work on the default executor
+_replicate_executor = ThreadPoolExecutor(
+    max_workers=GENERATION_LIMIT,
+    thread_name_prefix="replicate",
+)
+
+_generation_semaphore: Optional[asyncio.Semaphore] = None
+_generation_semaphore_loop: Optional[asyncio.AbstractEventLoop] = None
+_generation_stats = {"active": 0, "waiting": 0}
+
+
+def _get_generation_semaphore() -> asyncio.Semaphore:
+    """Get the generation semaphore, bound to the running event loop."""
+    global _generation_semaphore, _generation_semaphore_loop
+    loop = asyncio.get_running_loop()
+    if _generation_semaphore is None or _generation_semaphore_loop is not loop:
+        # generate_styled_variations_sync runs a fresh loop per call
+        _generation_semaphore = asyncio.Semaphore(GENERATION_LIMIT)
+        _generation_semaphore_loop = loop
+    return _generation_semaphore
+
+
+@asynccontextmanager
+async def _generation_slot():
+    """Hold one Replicate slot, tracking active/waiting counts."""
+    semaphore = _get_generation_semaphore()
+
+    _generation_stats["waiting"] += 1
     try:
-        import replicate
-        return replicate.Client(api_token=settings.REPLICATE_API_TOKEN)
-    except ImportError:
-        raise ImportError("replicate package required. Install with: pip install replicate")
+        await semaphore.acquire()
+    finally:
+        _generation_stats["waiting"] -= 1
+
+    _generation_stats["active"] += 1
+    try:
+        yield
+    finally:
+        _generation_stats["active"] -= 1
+        semaphore.release()
+
+
+def get_generation_stats() -> dict:
+    """
+    Snapshot of Replicate back-pressure for this worker process.
+
+    Returns:
+        Dict with the per-process limit and active/waiting call counts
+    """
+    return {"limit": GENERATION_LIMIT, **_generation_stats}
 
 
+@lru_cache(maxsize=8)
 def _select_controlnet_model(controlnet_type: str) -> str:
     """Select appropriate ControlNet model based on type."""
     if controlnet_type == "canny":
@@ -81,16 +182,18 @@ def _select_controlnet_model(controlnet_type: str) -> str:
         return settings.CONTROLNET_LINEART_MODEL
 
 
-def _build_generation_params(
-    control_image_b64: str,
+@lru_cache(maxsize=32)
+def _build_param_template(
     style_preset: StylePreset,
-    seed: int,
     config: ControlNetConfig
 ) -> dict:
     """
-    Build generation parameters for Replicate API.
+    Build the static part of the Replicate parameters for a style.
 
-    Uses strict settings optimized for structure preservation.
+    Uses strict settings optimized for structure preservation. Everything
+    except the control image and seed depends only on (style, config), both
+    frozen and hashable, so templates are cached. Callers must not mutate
+    the returned dict.
     """
     # Get style-specific overrides or use defaults
     denoise = style_preset.denoise_strength or config.denoise_strength
@@ -98,7 +201,6 @@ def _build_generation_params(
     guidance = style_preset.guidance_scale or config.guidance_scale
 
     return {
-        "image": control_image_b64,
         "prompt": style_preset.prompt_template,
         "negative_prompt": style_preset.negative_prompt,
         "num_outputs": 1,
@@ -115,35 +217,71 @@ def _build_generation_params(
         "controlnet_conditioning_scale": cond_scale,
         "control_guidance_start": config.guidance_start,
         "control_guidance_end": config.guidance_end,
-
-        # Reproducibility
-        "seed": seed,
     }
 
 
-async def generate_single_variation(
+# Warm templates for the built-in styles with the default config
+for _preset in STYLE_PRESETS.values():
+    _build_param_template(_preset, controlnet_config)
+del _preset
+
+
+def _build_generation_params(
     control_image_b64: str,
-    stroke_mask: Image.Image,
     style_preset: StylePreset,
     seed: int,
     config: ControlNetConfig
-) -> GenerationResult:
+) -> dict:
     """
-    Generate a single styled variation.
+    Build generation parameters for Replicate API.
 
-    Args:
-        control_image_b64: Base64 encoded control image
-        stroke_mask: Original stroke mask for structure validation
-        style_preset: Style configuration
-        seed: Random seed for this variation
-        config: ControlNet configuration
+    Only the control image and seed are added per call; the rest comes
+    from the cached per-(style, config) template, which also covers the
+    stricter retry config after its first use.
+    """
+    return {
+        **_build_param_template(style_preset, config),
+        "image": control_image_b64,
+
+        # Reproducibility
+        "seed": seed,
+    }
+
+
+def _summarize_variations(
+    variations: Sequence[GenerationResult]
+) -> tuple[int, int, list[int]]:
+    """
+    Summarize variations in a single pass.
 
     Returns:
-        GenerationResult with image, structure score, and timing
+        Tuple of (best index by combined score, passing count, failing indices)
     """
-    import time
-    start_time = time.time()
+    best_index = 0
+    best_score = float('-inf')
+    passing_count = 0
+    failing_indices = []
+
+    for i, v in enumerate(variations):
+        match = v.structure_match
+        if match.combined_score > best_score:
+            best_score = match.combined_score
+            best_index = i
+        if match.structure_preserved:
+            passing_count += 1
+        else:
+            failing_indices.append(i)
 
+    return best_index, passing_count, failing_indices
+
+
+async def _submit_generation(
+    control_image_b64: str,
+    style_preset: StylePreset,
+    seed: int,
+    config: ControlNetConfig
+) -> str:
+    """Run one Replicate generation and return the output image URL."""
     # Select model
     model = _select_controlnet_model(style_preset.controlnet_type)
 
@@ -151,34 +289,83 @@ async def generate_single_variation(
     params = _build_generation_params(control_image_b64, style_preset, seed, config)
 
     # Run generation
-    replicate = _get_replicate_client()
+    client = _get_replicate_client()
 
-    # Run in thread pool to avoid blocking
-    loop = asyncio.get_event_loop()
-    output = await loop.run_in_executor(
-        _executor,
-        lambda: replicate.run(model, input=params)
-    )
+    # Run on the Replicate pool to avoid blocking; the slot caps calls in flight
+    async with _generation_slot():
+        loop = asyncio.get_running_loop()
+        output = await loop.run_in_executor(
+            _replicate_executor, partial(client.run, model, input=params)
+        )
 
     # Extract image URL from output
     if isinstance(output, list) and len(output) > 0:
-        image_url = output[0]
+        return output[0]
     elif isinstance(output, str):
-        image_url = output
+        return output
     else:
         raise ValueError(f"Unexpected output format: {type(output)}")
 
-    # Download generated image
-    async with httpx.AsyncClient() as client:
-        response = await client.get(image_url)
+
+async def _download_image(image_url: str) -> Image.Image:
+    """Download a generated image on the shared HTTP client."""
+    # Stream into one buffer instead of materializing response.content
+    buffer = io.BytesIO()
+    async with _get_http_client().stream("GET", image_url) as response:
         response.raise_for_status()
-        image_bytes = response.content
+        async for chunk in response.aiter_bytes(chunk_size=65536):
+            buffer.write(chunk)
+
+    buffer.seek(0)
+    return Image.open(buffer).convert('RGB')
+
+
+async def _score_image(
+    stroke_mask: Image.Image,
+    generated_image: Image.Image
+) -> StructureMatchResult:
+    """Compute structure match off the event loop."""
+    return await asyncio.to_thread(compute_structure_match, stroke_mask, generated_image)
+
+
+def _preprocess_for_generation(
+    input_data: str | bytes | Image.Image
+) -> tuple[ControlImageResult, str]:
+    """
+    Preprocess input and base64-encode its control image (blocking).
+
+    Both steps are cached per sigil, but a miss rasterizes and PNG-encodes
+    a 1024px image, so callers run this off the event loop.
+    """
+    preprocess_result = preprocess_control_image(input_data)
+    return preprocess_result, preprocess_result.control_image_base64
+
+
+async def generate_single_variation(
+    control_image_b64: str,
+    stroke_mask: Image.Image,
+    style_preset: StylePreset,
+    seed: int,
+    config: ControlNetConfig
+) -> GenerationResult:
+    """
+    Generate a single styled variation.
 
-    # Load as PIL Image
-    generated_image = Image.open(io.BytesIO(image_bytes)).convert('RGB')
+    Args:
+        control_image_b64: Base64 encoded control image
+        stroke_mask: Original stroke mask for structure validation
+        style_preset: Style configuration
+        seed: Random seed for this variation
+        config: ControlNet configuration
 
-    # Compute structure match
-    structure_match = compute_structure_match(stroke_mask, generated_image)
+    Returns:
+        GenerationResult with image, structure score, and timing
+    """
+    start_time = time.time()
+
+    image_url = await _submit_generation(control_image_b64, style_preset, seed, config)
+    generated_image = await _download_image(image_url)
+    structure_match = await _score_image(stroke_mask, generated_image)
 
     generation_time_ms = int((time.time() - start_time) * 1000)
 
@@ -213,7 +400,25 @@ async def generate_styled_variations(
     Returns:
         StyledVariationsResult with all variations and metadata
     """
-    import time
+    result, _ = await _generate_styled_variations(
+        input_data, style_name, num_variations, config, base_seed
+    )
+    return result
+
+
+async def _generate_styled_variations(
+    input_data: str | bytes | Image.Image,
+    style_name: str,
+    num_variations: int = 4,
+    config: Optional[ControlNetConfig] = None,
+    base_seed: int = 2000
+) -> tuple[StyledVariationsResult, str]:
+    """
+    Implementation of generate_styled_variations.
+
+    Returns:
+        Tuple of (result, base64 control image) so retries can reuse it
+    """
     start_time = time.time()
 
     if config is None:
@@ -225,11 +430,10 @@ async def generate_styled_variations(
 
     style_preset = STYLE_PRESETS[style_name]
 
-    # Preprocess input to control image
-    preprocess_result: ControlImageResult = preprocess_control_image(input_data)
-
-    # Convert control image to base64
-    control_image_b64 = image_to_base64(preprocess_result.control_image)
+    # Preprocess input to control image (off the loop on a cache miss)
+    preprocess_result, control_image_b64 = await asyncio.to_thread(
+        _preprocess_for_generation, input_data
+    )
 
     # Generate variations in parallel
     seeds = [base_seed + i * 456 for i in range(num_variations)]
@@ -247,22 +451,13 @@ async def generate_styled_variations(
 
     variations = await asyncio.gather(*tasks)
 
-    # Find best variation (highest structure score)
-    best_index = max(
-        range(len(variations)),
-        key=lambda i: variations[i].structure_match.combined_score
-    )
-
-    # Count passing variations
-    passing_count = sum(
-        1 for v in variations
-        if v.structure_match.structure_preserved
-    )
+    # Find best variation (highest structure score) and count passing ones
+    best_index, passing_count, _ = _summarize_variations(variations)
 
     total_time_ms = int((time.time() - start_time) * 1000)
 
-    return StyledVariationsResult(
-        variations=list(variations),
+    result = StyledVariationsResult(
+        variations=tuple(variations),
         control_image=preprocess_result.control_image,
         stroke_mask=preprocess_result.stroke_mask,
         style_applied=style_name,
@@ -273,6 +468,66 @@ async def generate_styled_variations(
         best_variation_index=best_index
     )
 
+    return result, control_image_b64
+
+
+async def iter_styled_variations(
+    input_data: str | bytes | Image.Image,
+    style_name: str,
+    num_variations: int = 4,
+    config: Optional[ControlNetConfig] = None,
+    base_seed: int = 2000
+) -> AsyncIterator[GenerationResult]:
+    """
+    Generate styled variations, yielding each one as soon as it finishes.
+
+    Same generation as generate_styled_variations (same seeds), but results
+    arrive in completion order so callers can stream them. No retry pass.
+
+    Args:
+        input_data: SVG string, PNG bytes, or PIL Image
+        style_name: Style preset name
+        num_variations: Number of variations to generate
+        config: ControlNet configuration (uses optimized defaults if None)
+        base_seed: Base seed for variation generation
+
+    Yields:
+        GenerationResult for each variation, in completion order
+    """
+    if config is None:
+        config = controlnet_config
+
+    # Validate style
+    if style_name not in STYLE_PRESETS:
+        raise ValueError(f"Unknown style: {style_name}. Available: {list(STYLE_PRESETS.keys())}")
+
+    style_preset = STYLE_PRESETS[style_name]
+
+    preprocess_result, control_image_b64 = await asyncio.to_thread(
+        _preprocess_for_generation, input_data
+    )
+
+    seeds = [base_seed + i * 456 for i in range(num_variations)]
+
+    tasks = [
+        asyncio.ensure_future(generate_single_variation(
+            control_image_b64,
+            preprocess_result.stroke_mask,
+            style_preset,
+            seed,
+            config
+        ))
+        for seed in seeds
+    ]
+
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # Client went away or a variation failed - stop the rest
+        for task in tasks:
+            task.cancel()
+
 
 async def generate_with_auto_retry(
     input_data: str | bytes | Image.Image,
@@ -302,13 +557,23 @@ async def generate_with_auto_retry(
     if config is None:
         config = controlnet_config
 
-    result = await generate_styled_variations(
+    result, control_image_b64 = await _generate_styled_variations(
         input_data, style_name, num_variations, config
     )
 
     if result.passing_count >= min_passing:
         return result
 
+    # Best variation is already near-perfect; not worth a retry round
+    best = result.variations[result.best_variation_index]
+    if best.structure_match.combined_score >= 0.98:
+        return result
+
+    # Identify failing indices
+    _, _, failing_indices = _summarize_variations(result.variations)
+    if not failing_indices:
+        return result
+
     # Need to retry some variations with stricter parameters
     stricter_config = ControlNetConfig(
         conditioning_scale=min(config.conditioning_scale + 0.15, 1.5),
@@ -319,16 +584,6 @@ async def generate_with_auto_retry(
         num_inference_steps=config.num_inference_steps + 5,
     )
 
-    # Identify failing indices
-    failing_indices = [
-        i for i, v in enumerate(result.variations)
-        if not v.structure_match.structure_preserved
-    ]
-
-    # Preprocess again (reuse from first result)
-    preprocess_result = preprocess_control_image(input_data)
-    control_image_b64 = image_to_base64(preprocess_result.control_image)
-
     style_preset = STYLE_PRESETS[style_name]
 
     # Regenerate failing variations with stricter params
@@ -337,7 +592,7 @@ async def generate_with_auto_retry(
     retry_tasks = [
         generate_single_variation(
             control_image_b64,
-            preprocess_result.stroke_mask,
+            result.stroke_mask,
             style_preset,
             seed,
             stricter_config
@@ -347,26 +602,32 @@ async def generate_with_auto_retry(
 
     retry_results = await asyncio.gather(*retry_tasks)
 
-    # Replace failing variations with retries if they're better
-    for i, fail_idx in enumerate(failing_indices):
-        if i < len(retry_results):
-            retry = retry_results[i]
-            original = result.variations[fail_idx]
-
-            # Use retry if it scores better
-            if retry.structure_match.combined_score > original.structure_match.combined_score:
-                result.variations[fail_idx] = retry
-
-    # Recalculate passing count and best index
-    result.passing_count = sum(
-        1 for v in result.variations
-        if v.structure_match.structure_preserved
-    )
-
-    result.best_variation_index = max(
-        range(len(result.variations)),
-        key=lambda i: result.variations[i].structure_match.combined_score
-    )
+    # Replace failing variations with retries if they're better, tracking
+    # best index and passing count in the same pass
+    retries = dict(zip(failing_indices, retry_results))
+    variations = []
+    best_index = 0
+    best_score = float('-inf')
+    passing_count = 0
+
+    for i, v in enumerate(result.variations):
+        retry = retries.get(i)
+
+        # Use retry if it scores better
+        if retry is not None and retry.structure_match.combined_score > v.structure_match.combined_score:
+            v = retry
+        variations.append(v)
+
+        match = v.structure_match
+        if match.combined_score > best_score:
+            best_score = match.combined_score
+            best_index = i
+        if match.structure_preserved:
+            passing_count += 1
+
+    result.variations = tuple(variations)
+    result.best_variation_index = best_index
+    result.passing_count = passing_count
 
     return result
 
@@ -379,6 +640,13 @@ def generate_styled_variations_sync(
     config: Optional[ControlNetConfig] = None
 ) -> StyledVariationsResult:
     """Synchronous wrapper for generate_styled_variations."""
-    return asyncio.run(generate_styled_variations(
-        input_data, style_name, num_variations, config
-    ))
+    async def _run() -> StyledVariationsResult:
+        try:
+            return await generate_styled_variations(
+                input_data, style_name, num_variations, config
+            )
+        finally:
+            # The shared client is bound to this event loop
+            await close_http_client()
+
+    return asyncio.run(_run())
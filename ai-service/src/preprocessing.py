@@ -12,11 +12,16 @@ Key features:
 import io
 import re
 import base64
+import binascii
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import cached_property, lru_cache
 from typing import Tuple, Optional
 from dataclasses import dataclass
 
 import numpy as np
-from PIL import Image, ImageFilter, ImageOps
+from PIL import Image
 import cv2
 
 try:
@@ -25,7 +30,13 @@ try:
 except ImportError:
     HAS_CAIROSVG = False
 
-from .config import preprocess_config, PreprocessConfig
+try:
+    from numba import njit, types
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
+from .config import settings, preprocess_config, PreprocessConfig
 
 
 @dataclass
@@ -37,6 +48,12 @@ class ControlImageResult:
     dilated_mask: Image.Image        # Dilated mask for compositing protection
     original_bounds: Tuple[int, int, int, int]  # Bounding box of content
     processing_info: dict            # Debug/logging information
+    control_gray: Optional[np.ndarray] = None  # Read-only grayscale control array
+
+    @cached_property
+    def control_image_base64(self) -> str:
+        """Control image as a base64 data URL, encoded once per result."""
+        return image_to_base64(self.control_image)
 
 
 def svg_to_png(svg_string: str, size: int = 1024) -> Image.Image:
@@ -50,6 +67,12 @@ def svg_to_png(svg_string: str, size: int = 1024) -> Image.Image:
     Returns:
         PIL Image (RGBA)
     """
+    # Load as PIL Image
+    return Image.open(io.BytesIO(_render_svg(svg_string, size))).convert('RGBA')
+
+
+def _render_svg(svg_string: str, size: int) -> bytes:
+    """Rasterize an SVG (white strokes, transparent background) to PNG bytes."""
     if not HAS_CAIROSVG:
         raise ImportError("cairosvg required for SVG conversion. Install with: pip install cairosvg")
 
@@ -57,14 +80,28 @@ def svg_to_png(svg_string: str, size: int = 1024) -> Image.Image:
     processed_svg = _preprocess_svg(svg_string)
 
     # Convert to PNG bytes
-    png_bytes = cairosvg.svg2png(
+    return cairosvg.svg2png(
         bytestring=processed_svg.encode('utf-8'),
         output_width=size,
         output_height=size,
     )
 
-    # Load as PIL Image
-    return Image.open(io.BytesIO(png_bytes)).convert('RGBA')
+
+# SVG rewrite patterns, compiled once
+_SVG_WIDTH_RE = re.compile(r'width="(\d+)"')
+_SVG_HEIGHT_RE = re.compile(r'height="(\d+)"')
+_SVG_PAINT_RE = re.compile(r'(stroke|fill)="[^"]*"')
+
+# Replacement per paint attribute: white strokes, no fills
+_SVG_PAINT_VALUES = {
+    'stroke': 'stroke="#FFFFFF"',
+    'fill': 'fill="none"',
+}
+
+
+def _svg_paint_replacement(match: re.Match) -> str:
+    """Replacement for one stroke/fill attribute match."""
+    return _SVG_PAINT_VALUES[match.group(1)]
 
 
 def _preprocess_svg(svg_string: str) -> str:
@@ -79,8 +116,8 @@ def _preprocess_svg(svg_string: str) -> str:
 
     # Ensure viewBox exists
     if 'viewBox' not in processed:
-        width_match = re.search(r'width="(\d+)"', processed)
-        height_match = re.search(r'height="(\d+)"', processed)
+        width_match = _SVG_WIDTH_RE.search(processed)
+        height_match = _SVG_HEIGHT_RE.search(processed)
 
         if width_match and height_match:
             w, h = width_match.group(1), height_match.group(1)
@@ -88,19 +125,21 @@ def _preprocess_svg(svg_string: str) -> str:
         else:
             processed = processed.replace('<svg', '<svg viewBox="0 0 100 100"', 1)
 
-    # Force white strokes
-    processed = re.sub(r'stroke="[^"]*"', 'stroke="#FFFFFF"', processed)
-
-    # Remove fills
-    processed = re.sub(r'fill="[^"]*"', 'fill="none"', processed)
+    # Force white strokes and remove fills in one pass
+    processed = _SVG_PAINT_RE.sub(_svg_paint_replacement, processed)
 
     # Ensure stroke-width exists
     if 'stroke-width' not in processed:
-        processed = re.sub(r'<path ', '<path stroke-width="2" ', processed)
+        processed = processed.replace('<path ', '<path stroke-width="2" ')
 
     return processed
 
 
+def _gray_array(image: Image.Image) -> np.ndarray:
+    """Read-only grayscale array of a PIL image, without copying 'L' images twice."""
+    return np.asarray(image if image.mode == 'L' else image.convert('L'))
+
+
 def thicken_strokes(
     image: Image.Image,
     multiplier: float = 2.0,
@@ -122,23 +161,36 @@ def thicken_strokes(
         Image with thickened strokes
     """
     # Convert to numpy array
-    img_array = np.array(image.convert('L'))
+    img_array = _gray_array(image)
+
+    # Dilate (thicken) the strokes
+    kernel = _stroke_kernel(multiplier, min_width, max_width)
+    dilated = cv2.dilate(img_array, kernel, iterations=1)
+
+    return Image.fromarray(dilated)
+
+
+@lru_cache(maxsize=32)
+def _structuring_element(shape: int, size: int) -> np.ndarray:
+    """Cached square structuring element; read-only, shared across calls."""
+    kernel = cv2.getStructuringElement(shape, (size, size))
+    kernel.flags.writeable = False
+    return kernel
 
+
+def _stroke_kernel(
+    multiplier: float,
+    min_width: int,
+    max_width: int
+) -> np.ndarray:
+    """Circular dilation kernel sized from the stroke multiplier."""
     # Calculate kernel size based on multiplier
     kernel_size = max(min_width, min(max_width, int(3 * multiplier)))
     if kernel_size % 2 == 0:
         kernel_size += 1  # Ensure odd kernel size
 
     # Create circular kernel for smooth dilation
-    kernel = cv2.getStructuringElement(
-        cv2.MORPH_ELLIPSE,
-        (kernel_size, kernel_size)
-    )
-
-    # Dilate (thicken) the strokes
-    dilated = cv2.dilate(img_array, kernel, iterations=1)
-
-    return Image.fromarray(dilated)
+    return _structuring_element(cv2.MORPH_ELLIPSE, kernel_size)
 
 
 def add_padding(
@@ -160,20 +212,20 @@ def add_padding(
     width, height = image.size
     padding_px = int(max(width, height) * padding_percent)
 
-    # Find content bounding box
-    img_array = np.array(image.convert('L'))
-    coords = np.column_stack(np.where(img_array > 10))
+    # Find content bounding box (no per-pixel coordinate arrays)
+    img_array = _gray_array(image)
+    _, content_mask = cv2.threshold(img_array, 10, 255, cv2.THRESH_BINARY)
+    x, y, w, h = cv2.boundingRect(content_mask)
 
-    if len(coords) == 0:
+    if w == 0 or h == 0:
         # Empty image - return as-is
         return image, (0, 0, width, height)
 
-    y_min, x_min = coords.min(axis=0)
-    y_max, x_max = coords.max(axis=0)
+    x_min, y_min = x, y
+    x_max, y_max = x + w - 1, y + h - 1
 
-    # Create new image with padding
+    # Padded canvas size
     new_size = max(width, height) + 2 * padding_px
-    new_image = Image.new('L', (new_size, new_size), background_color)
 
     # Calculate centered position
     content_width = x_max - x_min
@@ -181,12 +233,14 @@ def add_padding(
     paste_x = (new_size - content_width) // 2
     paste_y = (new_size - content_height) // 2
 
-    # Crop content and paste centered
-    content = image.crop((x_min, y_min, x_max + 1, y_max + 1))
-    if content.mode != 'L':
-        content = content.convert('L')
-
-    new_image.paste(content, (paste_x, paste_y))
+    # Border the content view out to the centered canvas in one copy
+    new_array = cv2.copyMakeBorder(
+        img_array[y_min:y_max + 1, x_min:x_max + 1],
+        paste_y, new_size - paste_y - h,
+        paste_x, new_size - paste_x - w,
+        cv2.BORDER_CONSTANT, value=background_color
+    )
+    new_image = Image.fromarray(new_array)
 
     # Return bounds relative to new image
     bounds = (paste_x, paste_y, paste_x + content_width, paste_y + content_height)
@@ -194,6 +248,91 @@ def add_padding(
     return new_image, bounds
 
 
+def _build_control(
+    image: Image.Image,
+    config: PreprocessConfig
+) -> Tuple[np.ndarray, Tuple[int, int, int, int], bool]:
+    """
+    Resize, invert, thicken, pad and center a grayscale sigil in one pass.
+
+    Equivalent to resize -> invert -> thicken_strokes -> add_padding ->
+    resize, but works on a single uint8 buffer and resamples only a
+    zero-bordered patch around the content straight onto the final canvas,
+    instead of building the padded image and shrinking all of it back.
+
+    Args:
+        image: Grayscale ('L') input image
+        config: Preprocessing configuration
+
+    Returns:
+        Tuple of (control array, content bounds in padded coordinates as
+        add_padding reports them, whether the input was inverted)
+    """
+    size = config.output_size
+
+    # Resize to target size (OpenCV SIMD: area when shrinking, Lanczos when enlarging)
+    buf = np.array(image)
+    if buf.shape != (size, size):
+        height, width = buf.shape
+        interpolation = cv2.INTER_AREA if size <= min(width, height) else cv2.INTER_LANCZOS4
+        buf = cv2.resize(buf, (size, size), interpolation=interpolation)
+
+    # Invert in place if needed (ensure white strokes on black)
+    inverted = cv2.mean(buf)[0] > 127
+    if inverted:
+        cv2.bitwise_not(buf, dst=buf)
+
+    # Thicken strokes in place
+    kernel = _stroke_kernel(config.stroke_multiplier, config.min_stroke_width, config.max_stroke_width)
+    cv2.dilate(buf, kernel, dst=buf)
+
+    # Content bounding box
+    _, content_mask = cv2.threshold(buf, 10, 255, cv2.THRESH_BINARY)
+    x, y, w, h = cv2.boundingRect(content_mask)
+    if w == 0 or h == 0:
+        # Empty image - return as-is
+        return buf, (0, 0, size, size), inverted
+
+    # Centered placement on the padded canvas (same math as add_padding)
+    padded_size = size + 2 * int(size * config.padding_percent)
+    paste_x = (padded_size - (w - 1)) // 2
+    paste_y = (padded_size - (h - 1)) // 2
+    bounds = (paste_x, paste_y, paste_x + w - 1, paste_y + h - 1)
+
+    # Content patch with a zero border wide enough for the Lanczos support;
+    # its origin in padded coordinates is (paste - margin)
+    margin = 8
+    patch = cv2.copyMakeBorder(
+        buf[y:y + h, x:x + w], margin, margin, margin, margin,
+        cv2.BORDER_CONSTANT, value=0
+    )
+
+    # Output pixels covering the content, and the matching source box -
+    # the same sampling positions as resizing the whole padded image
+    scale = size / padded_size
+    dst_x0 = max(0, int((paste_x * scale)) - 2)
+    dst_y0 = max(0, int((paste_y * scale)) - 2)
+    dst_x1 = min(size, int((paste_x + w) * scale) + 3)
+    dst_y1 = min(size, int((paste_y + h) * scale) + 3)
+    box = (
+        dst_x0 / scale - (paste_x - margin),
+        dst_y0 / scale - (paste_y - margin),
+        dst_x1 / scale - (paste_x - margin),
+        dst_y1 / scale - (paste_y - margin),
+    )
+
+    content = Image.fromarray(patch).resize(
+        (dst_x1 - dst_x0, dst_y1 - dst_y0),
+        Image.Resampling.LANCZOS,
+        box=box
+    )
+
+    canvas = np.zeros((size, size), dtype=np.uint8)
+    canvas[dst_y0:dst_y1, dst_x0:dst_x1] = np.asarray(content)
+
+    return canvas, bounds, inverted
+
+
 def create_stroke_mask(
     image: Image.Image,
     threshold: int = 128
@@ -208,9 +347,13 @@ def create_stroke_mask(
     Returns:
         Binary mask (white=stroke, black=background)
     """
-    img_array = np.array(image.convert('L'))
+    return Image.fromarray(_stroke_mask_array(_gray_array(image), threshold))
+
+
+def _stroke_mask_array(img_array: np.ndarray, threshold: int = 128) -> np.ndarray:
+    """Array implementation of create_stroke_mask."""
     _, binary = cv2.threshold(img_array, threshold, 255, cv2.THRESH_BINARY)
-    return Image.fromarray(binary)
+    return binary
 
 
 def create_dilated_mask(
@@ -230,19 +373,36 @@ def create_dilated_mask(
     Returns:
         Dilated binary mask
     """
-    mask_array = np.array(mask)
+    return Image.fromarray(_dilated_mask_array(np.asarray(mask), dilation_px))
 
-    # Create circular kernel
-    kernel_size = dilation_px * 2 + 1
-    kernel = cv2.getStructuringElement(
-        cv2.MORPH_ELLIPSE,
-        (kernel_size, kernel_size)
-    )
+
+def _dilated_mask_array(mask_array: np.ndarray, dilation_px: int) -> np.ndarray:
+    """Array implementation of create_dilated_mask."""
+    # Rectangular kernel: separable, so OpenCV dilates in O(k) per pixel.
+    # It covers a superset of the circular buffer, which is fine for a
+    # protection mask (stroke geometry itself uses the circular kernel).
+    kernel = _structuring_element(cv2.MORPH_RECT, dilation_px * 2 + 1)
 
     # Dilate mask
-    dilated = cv2.dilate(mask_array, kernel, iterations=1)
+    return cv2.dilate(mask_array, kernel, iterations=1)
 
-    return Image.fromarray(dilated)
+
+if HAS_NUMBA:
+    # Explicit signatures (inputs writable or read-only): compiled, or loaded
+    # from the on-disk cache, at import rather than on the first request
+    _U8_FLAT = (types.Array(types.uint8, 1, 'C'), types.Array(types.uint8, 1, 'C', readonly=True))
+
+    @njit(
+        [types.void(orig, blur, types.int64, _U8_FLAT[0]) for orig in _U8_FLAT for blur in _U8_FLAT],
+        fastmath=True,
+        cache=True
+    )
+    def _unsharp_u8(orig, blur, amount_q8, out):
+        """Fused unsharp mask over flat uint8 arrays (Q8 fixed-point amount)."""
+        for i in range(orig.size):
+            o = np.int32(orig[i])
+            v = o + (((o - np.int32(blur[i])) * amount_q8) >> 8)
+            out[i] = min(max(v, 0), 255)
 
 
 def enhance_edges(
@@ -259,21 +419,55 @@ def enhance_edges(
     Returns:
         Edge-enhanced image
     """
-    # Apply unsharp mask for edge enhancement
-    blurred = image.filter(ImageFilter.GaussianBlur(radius=sigma))
+    return Image.fromarray(_enhance_edges_array(np.asarray(image), sigma))
+
 
-    # Create sharpened version
-    img_array = np.array(image).astype(float)
-    blur_array = np.array(blurred).astype(float)
+def _enhance_edges_array(img_array: np.ndarray, sigma: float) -> np.ndarray:
+    """Array implementation of enhance_edges (uint8 in, uint8 out)."""
+    # Apply unsharp mask for edge enhancement (OpenCV SIMD Gaussian;
+    # sigma = radius, matching PIL's GaussianBlur)
+    blur_array = cv2.GaussianBlur(img_array, (0, 0), sigma)
 
-    # Unsharp mask: original + (original - blurred) * amount
+    # Unsharp mask: original + (original - blurred) * amount, in Q8 fixed
+    # point (exact for 1.5; floor matches the old float->uint8 truncation)
     amount = 1.5
-    sharpened = img_array + (img_array - blur_array) * amount
+    amount_q8 = int(round(amount * 256))
+
+    if HAS_NUMBA:
+        sharpened = np.empty_like(img_array)
+        _unsharp_u8(img_array.ravel(), blur_array.ravel(), amount_q8, sharpened.ravel())
+    else:
+        detail = img_array.astype(np.int32)
+        detail -= blur_array
+        detail *= amount_q8
+        detail >>= 8
+        detail += img_array
+        np.clip(detail, 0, 255, out=detail)
+        sharpened = detail.astype(np.uint8)
+
+    return sharpened
 
-    # Clip to valid range
-    sharpened = np.clip(sharpened, 0, 255).astype(np.uint8)
 
-    return Image.fromarray(sharpened)
+# LRU cache of preprocessing results keyed by input hash (SVG/bytes inputs only).
+# Each entry holds ~5 MB of 1024px images, so keep it small.
+_PREPROCESS_CACHE_SIZE = settings.PREPROCESS_CACHE_SIZE
+_preprocess_cache: "OrderedDict[tuple, ControlImageResult]" = OrderedDict()
+_preprocess_cache_lock = threading.Lock()
+
+
+def _preprocess_cache_key(
+    input_data: str | bytes | Image.Image,
+    config: PreprocessConfig
+) -> Optional[tuple]:
+    """Build cache key from a blake2b digest of the input; None if uncacheable."""
+    if isinstance(input_data, str):
+        data = input_data.encode('utf-8')
+    elif isinstance(input_data, bytes):
+        data = input_data
+    else:
+        return None
+
+    return (hashlib.blake2b(data, digest_size=16).digest(), config.model_dump_json())
 
 
 def preprocess_control_image(
@@ -288,6 +482,10 @@ def preprocess_control_image(
     - Binary stroke mask
     - Dilated mask for compositing
 
+    Results for SVG/base64 strings and PNG bytes are cached (LRU) by content
+    hash, so the same sigil is only rasterized and dilated once across the
+    generate -> composite path. Cached results are shared; treat as read-only.
+
     Args:
         input_data: SVG string, PNG bytes, base64 data URL, or PIL Image
         config: Preprocessing configuration (uses defaults if None)
@@ -298,6 +496,32 @@ def preprocess_control_image(
     if config is None:
         config = preprocess_config
 
+    key = _preprocess_cache_key(input_data, config)
+    if key is None or _PREPROCESS_CACHE_SIZE == 0:
+        return _preprocess_control_image(input_data, config)
+
+    with _preprocess_cache_lock:
+        cached = _preprocess_cache.get(key)
+        if cached is not None:
+            _preprocess_cache.move_to_end(key)
+            return cached
+
+    result = _preprocess_control_image(input_data, config)
+
+    with _preprocess_cache_lock:
+        _preprocess_cache[key] = result
+        _preprocess_cache.move_to_end(key)
+        while len(_preprocess_cache) > _PREPROCESS_CACHE_SIZE:
+            _preprocess_cache.popitem(last=False)
+
+    return result
+
+
+def _preprocess_control_image(
+    input_data: str | bytes | Image.Image,
+    config: PreprocessConfig
+) -> ControlImageResult:
+    """Uncached implementation of preprocess_control_image."""
     processing_info = {"steps": []}
 
     # Step 1: Load/convert to PIL Image
@@ -312,20 +536,20 @@ def preprocess_control_image(
     elif isinstance(input_data, str):
         if input_data.startswith('data:image'):
             # Base64 data URL
-            base64_data = input_data.split(',')[1]
-            image_bytes = base64.b64decode(base64_data)
+            image_bytes = base64_to_bytes(input_data)
             image = Image.open(io.BytesIO(image_bytes)).convert('L')
             processing_info["steps"].append("Decoded base64 data URL")
 
         elif input_data.strip().startswith('<svg'):
-            # SVG string
-            image = svg_to_png(input_data, config.output_size).convert('L')
+            # SVG string (decode the PNG straight to grayscale, no RGBA copy)
+            png_bytes = _render_svg(input_data, config.output_size)
+            image = Image.open(io.BytesIO(png_bytes)).convert('L')
             processing_info["steps"].append("Converted SVG to PNG")
 
         else:
             # Assume base64 without data URL prefix
             try:
-                image_bytes = base64.b64decode(input_data)
+                image_bytes = base64_to_bytes(input_data)
                 image = Image.open(io.BytesIO(image_bytes)).convert('L')
                 processing_info["steps"].append("Decoded raw base64")
             except Exception:
@@ -337,67 +561,60 @@ def preprocess_control_image(
     original_size = image.size
     processing_info["original_size"] = original_size
 
-    # Step 2: Resize to target size (maintain aspect ratio)
-    image = image.resize((config.output_size, config.output_size), Image.Resampling.LANCZOS)
+    # Steps 2-6: resize, invert, thicken, pad/center and rescale in one pass
+    control_array, bounds, inverted = _build_control(image, config)
     processing_info["steps"].append(f"Resized to {config.output_size}x{config.output_size}")
-
-    # Step 3: Invert if needed (ensure white strokes on black)
-    img_array = np.array(image)
-    if np.mean(img_array) > 127:
-        # Image is mostly white, invert it
-        image = ImageOps.invert(image)
+    if inverted:
         processing_info["steps"].append("Inverted colors (was white background)")
-
-    # Step 4: Thicken strokes
-    thickened = thicken_strokes(
-        image,
-        multiplier=config.stroke_multiplier,
-        min_width=config.min_stroke_width,
-        max_width=config.max_stroke_width
-    )
     processing_info["steps"].append(f"Thickened strokes (multiplier: {config.stroke_multiplier})")
-
-    # Step 5: Add padding and center
-    padded, bounds = add_padding(
-        thickened,
-        padding_percent=config.padding_percent
-    )
     processing_info["steps"].append(f"Added {config.padding_percent*100:.0f}% padding")
     processing_info["content_bounds"] = bounds
 
-    # Step 6: Resize back to output size (padding may have changed dimensions)
-    control_image = padded.resize(
-        (config.output_size, config.output_size),
-        Image.Resampling.LANCZOS
-    )
+    # Steps 7-9 stay on uint8 arrays; PIL images are wrapped once at the end
 
     # Step 7: Enhance edges
-    control_image = enhance_edges(control_image, config.edge_enhance_sigma)
+    control_array = _enhance_edges_array(control_array, config.edge_enhance_sigma)
     processing_info["steps"].append("Enhanced edges")
 
     # Step 8: Create stroke mask from thickened image
-    stroke_mask = create_stroke_mask(control_image)
+    stroke_array = _stroke_mask_array(control_array)
     processing_info["steps"].append("Created stroke mask")
 
     # Step 9: Create dilated mask for compositing
-    dilated_mask = create_dilated_mask(stroke_mask, config.mask_dilation_px)
+    dilated_array = _dilated_mask_array(stroke_array, config.mask_dilation_px)
     processing_info["steps"].append(f"Created dilated mask ({config.mask_dilation_px}px)")
 
     # Convert control image to RGB (black bg, white strokes)
-    control_image_rgb = Image.merge('RGB', (control_image, control_image, control_image))
+    control_image_rgb = Image.fromarray(cv2.cvtColor(control_array, cv2.COLOR_GRAY2RGB))
+
+    # Shared through the result cache, so hand out the grayscale read-only
+    control_array.flags.writeable = False
 
     return ControlImageResult(
         control_image=control_image_rgb,
-        stroke_mask=stroke_mask,
-        dilated_mask=dilated_mask,
+        stroke_mask=Image.fromarray(stroke_array),
+        dilated_mask=Image.fromarray(dilated_array),
         original_bounds=bounds,
-        processing_info=processing_info
+        processing_info=processing_info,
+        control_gray=control_array
     )
 
 
+def base64_to_bytes(data: str) -> bytes:
+    """
+    Decode a base64 string or data URL to raw bytes.
+
+    Decodes the ASCII str directly with binascii, without first splitting
+    it or encoding it to bytes, so large uploads are not copied twice.
+    """
+    if data.startswith('data:'):
+        data = data[data.index(',') + 1:]
+    return binascii.a2b_base64(data)
+
+
 def image_to_base64(image: Image.Image, format: str = "PNG") -> str:
     """Convert PIL Image to base64 data URL."""
     buffer = io.BytesIO()
     image.save(buffer, format=format)
-    base64_data = base64.b64encode(buffer.getvalue()).decode('utf-8')
+    base64_data = base64.b64encode(buffer.getvalue()).decode('ascii')
     return f"data:image/{format.lower()};base64,{base64_data}"
@@ -8,15 +8,29 @@ Key metrics:
 - Combined structure match score
 """
 
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
 import numpy as np
 from PIL import Image
 import cv2
 from typing import Tuple, Optional
 from dataclasses import dataclass
 
+try:
+    from numba import njit, types
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
 from .config import structure_match_config, StructureMatchConfig
 
 
+# Shared pool for batch scoring (OpenCV/NumPy release the GIL)
+_batch_executor = ThreadPoolExecutor(max_workers=os.cpu_count())
+
+
 @dataclass
 class StructureMatchResult:
     """Result from structure matching analysis."""
@@ -29,6 +43,14 @@ class StructureMatchResult:
     analysis: dict                      # Detailed analysis info
 
 
+@lru_cache(maxsize=32)
+def _structuring_element(shape: int, size: int) -> np.ndarray:
+    """Cached square structuring element; read-only, shared across calls."""
+    kernel = cv2.getStructuringElement(shape, (size, size))
+    kernel.flags.writeable = False
+    return kernel
+
+
 def binarize_image(
     image: Image.Image,
     threshold: int = 128,
@@ -58,7 +80,7 @@ def binarize_image(
     _, binary = cv2.threshold(img_array, threshold, 255, cv2.THRESH_BINARY)
 
     if invert:
-        binary = 255 - binary
+        cv2.bitwise_not(binary, dst=binary)
 
     return binary
 
@@ -81,8 +103,13 @@ def extract_sigil_from_generated(
         Binary mask of detected sigil structure
     """
     # Convert to grayscale
-    gray = np.array(generated_image.convert('L'))
+    gray = np.asarray(generated_image.convert('L'))
+
+    return _extract_sigil_from_gray(gray, method)
+
 
+def _extract_sigil_from_gray(gray: np.ndarray, method: str) -> np.ndarray:
+    """Implementation of extract_sigil_from_generated on a grayscale array."""
     if method == "adaptive":
         # Adaptive thresholding works well for varied backgrounds
         binary = cv2.adaptiveThreshold(
@@ -90,20 +117,20 @@ def extract_sigil_from_generated(
             cv2.THRESH_BINARY, 21, 5
         )
         # May need to invert depending on sigil color
-        if np.mean(binary) > 127:
-            binary = 255 - binary
+        if cv2.mean(binary)[0] > 127:
+            cv2.bitwise_not(binary, dst=binary)
 
     elif method == "otsu":
         # Otsu's method finds optimal threshold
         _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-        if np.mean(binary) > 127:
-            binary = 255 - binary
+        if cv2.mean(binary)[0] > 127:
+            cv2.bitwise_not(binary, dst=binary)
 
     elif method == "edges":
         # Use edge detection
         edges = cv2.Canny(gray, 50, 150)
         # Dilate to connect edges
-        kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
+        kernel = _structuring_element(cv2.MORPH_ELLIPSE, 3)
         binary = cv2.dilate(edges, kernel, iterations=1)
 
     else:
@@ -113,6 +140,75 @@ def extract_sigil_from_generated(
     return binary
 
 
+if HAS_NUMBA:
+    # Explicit signatures (writable or read-only flat uint8 masks): compiled,
+    # or loaded from the on-disk cache, at import rather than on the first
+    # request
+    _U8_FLAT = (types.Array(types.uint8, 1, 'C'), types.Array(types.uint8, 1, 'C', readonly=True))
+
+    @njit(
+        [types.UniTuple(types.int64, 4)(m1, m2, types.int64) for m1 in _U8_FLAT for m2 in _U8_FLAT],
+        cache=True
+    )
+    def _iou_counts_u8(mask1, mask2, threshold):
+        """Single pass over flat uint8 masks: (intersection, union, n1, n2)."""
+        intersection = 0
+        union = 0
+        count1 = 0
+        count2 = 0
+        for i in range(mask1.size):
+            a = mask1[i] > threshold
+            b = mask2[i] > threshold
+            intersection += a and b
+            union += a or b
+            count1 += a
+            count2 += b
+        return intersection, union, count1, count2
+
+
+def _iou_counts(
+    mask1: np.ndarray,
+    mask2: np.ndarray,
+    threshold: int = 127
+) -> Tuple[int, int, int, int]:
+    """Intersection, union and per-mask pixel counts above threshold."""
+    same_u8 = (
+        mask1.dtype == np.uint8
+        and mask2.dtype == np.uint8
+        and mask1.shape == mask2.shape
+    )
+
+    if same_u8 and HAS_NUMBA:
+        return _iou_counts_u8(
+            np.ascontiguousarray(mask1).ravel(),
+            np.ascontiguousarray(mask2).ravel(),
+            threshold
+        )
+
+    if same_u8 and mask1.ndim == 2:
+        # SIMD byte-mask ops + countNonZero, no bool temporaries
+        _, binary1 = cv2.threshold(mask1, threshold, 255, cv2.THRESH_BINARY)
+        _, binary2 = cv2.threshold(mask2, threshold, 255, cv2.THRESH_BINARY)
+        return (
+            cv2.countNonZero(cv2.bitwise_and(binary1, binary2)),
+            cv2.countNonZero(cv2.bitwise_or(binary1, binary2)),
+            cv2.countNonZero(binary1),
+            cv2.countNonZero(binary2),
+        )
+
+    # Other dtypes/shapes: count_nonzero counts bool bytes without
+    # widening them to int64 the way .sum() does
+    mask1_binary = mask1 > threshold
+    mask2_binary = mask2 > threshold
+
+    return (
+        int(np.count_nonzero(np.logical_and(mask1_binary, mask2_binary))),
+        int(np.count_nonzero(np.logical_or(mask1_binary, mask2_binary))),
+        int(np.count_nonzero(mask1_binary)),
+        int(np.count_nonzero(mask2_binary)),
+    )
+
+
 def compute_iou(
     mask1: np.ndarray,
     mask2: np.ndarray
@@ -129,13 +225,13 @@ def compute_iou(
     Returns:
         Tuple of (IoU score 0-1, analysis dict)
     """
-    # Ensure binary
-    mask1_binary = (mask1 > 127).astype(np.uint8)
-    mask2_binary = (mask2 > 127).astype(np.uint8)
-
-    # Compute intersection and union
-    intersection = np.logical_and(mask1_binary, mask2_binary).sum()
-    union = np.logical_or(mask1_binary, mask2_binary).sum()
+    if mask1 is mask2:
+        # Same array: intersection == union == its own pixel count
+        pixels = int(np.count_nonzero(mask1 > 127))
+        intersection = union = mask1_pixels = mask2_pixels = pixels
+    else:
+        # Binarize, intersect, union and count in one pass
+        intersection, union, mask1_pixels, mask2_pixels = _iou_counts(mask1, mask2)
 
     if union == 0:
         # Both masks are empty
@@ -146,13 +242,43 @@ def compute_iou(
     analysis = {
         "intersection_pixels": int(intersection),
         "union_pixels": int(union),
-        "mask1_pixels": int(mask1_binary.sum()),
-        "mask2_pixels": int(mask2_binary.sum()),
+        "mask1_pixels": int(mask1_pixels),
+        "mask2_pixels": int(mask2_pixels),
     }
 
     return float(iou), analysis
 
 
+def compute_iou_batch(
+    ref_masks: np.ndarray,
+    pred_masks: np.ndarray
+) -> np.ndarray:
+    """
+    Compute IoU between every pair of reference and predicted masks.
+
+    Masks are flattened to 0/1 rows so all intersections come from one
+    matrix product (BLAS) instead of N*M compute_iou calls.
+
+    Args:
+        ref_masks: Stack of N binary masks, shape (N, H, W)
+        pred_masks: Stack of M binary masks, shape (M, H, W)
+
+    Returns:
+        (N, M) array of IoU scores (1.0 where both masks are empty,
+        matching compute_iou)
+    """
+    refs = (ref_masks.reshape(len(ref_masks), -1) > 127).astype(np.float32)
+    preds = (pred_masks.reshape(len(pred_masks), -1) > 127).astype(np.float32)
+
+    # float32 counts are exact up to 2**24 pixels per mask
+    intersection = refs @ preds.T
+    union = refs.sum(axis=1)[:, None] + preds.sum(axis=1)[None, :] - intersection
+
+    iou = np.ones_like(intersection, dtype=np.float64)
+    np.divide(intersection, union, out=iou, where=union > 0)
+    return iou
+
+
 def compute_edge_overlap(
     image1: np.ndarray,
     image2: np.ndarray,
@@ -181,35 +307,50 @@ def compute_edge_overlap(
     if len(image2.shape) == 3:
         image2 = cv2.cvtColor(image2, cv2.COLOR_RGB2GRAY)
 
-    # Detect edges
-    edges1 = cv2.Canny(image1, canny_low, canny_high)
-    edges2 = cv2.Canny(image2, canny_low, canny_high)
+    # Detect edges, dilated slightly for tolerance
+    edges1, edges1_dilated = _detect_edges(image1, canny_low, canny_high, tolerance_px)
+    edges2, edges2_dilated = _detect_edges(image2, canny_low, canny_high, tolerance_px)
+
+    return _edge_overlap_score(edges1, edges1_dilated, edges2, edges2_dilated)
+
+
+def _detect_edges(
+    image: np.ndarray,
+    canny_low: int,
+    canny_high: int,
+    tolerance_px: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Canny edges of a grayscale image and their tolerance-dilated copy."""
+    edges = cv2.Canny(image, canny_low, canny_high)
 
-    # Dilate edges slightly for tolerance
     if tolerance_px > 0:
-        kernel = cv2.getStructuringElement(
-            cv2.MORPH_ELLIPSE,
-            (tolerance_px * 2 + 1, tolerance_px * 2 + 1)
-        )
-        edges1_dilated = cv2.dilate(edges1, kernel, iterations=1)
-        edges2_dilated = cv2.dilate(edges2, kernel, iterations=1)
-    else:
-        edges1_dilated = edges1
-        edges2_dilated = edges2
+        kernel = _structuring_element(cv2.MORPH_ELLIPSE, tolerance_px * 2 + 1)
+        return edges, cv2.dilate(edges, kernel, iterations=1)
+
+    return edges, edges
 
+
+def _edge_overlap_score(
+    edges1: np.ndarray,
+    edges1_dilated: np.ndarray,
+    edges2: np.ndarray,
+    edges2_dilated: np.ndarray
+) -> Tuple[float, dict]:
+    """F1-style overlap of two edge maps, each matched against the other's dilation."""
     # Compute overlap: edges from image1 that fall within dilated edges2
-    edge1_pixels = (edges1 > 0).sum()
-    edge2_pixels = (edges2 > 0).sum()
+    # (Canny/dilate output is 0/255, so count bytes directly)
+    edge1_pixels = cv2.countNonZero(edges1)
+    edge2_pixels = cv2.countNonZero(edges2)
 
     if edge1_pixels == 0 or edge2_pixels == 0:
         return 0.0, {"edge1_pixels": int(edge1_pixels), "edge2_pixels": int(edge2_pixels), "no_edges": True}
 
     # How many edges from original are covered by generated
-    forward_match = np.logical_and(edges1 > 0, edges2_dilated > 0).sum()
+    forward_match = cv2.countNonZero(cv2.bitwise_and(edges1, edges2_dilated))
     forward_ratio = forward_match / edge1_pixels
 
     # How many edges from generated are covered by original
-    backward_match = np.logical_and(edges2 > 0, edges1_dilated > 0).sum()
+    backward_match = cv2.countNonZero(cv2.bitwise_and(edges2, edges1_dilated))
     backward_ratio = backward_match / edge2_pixels
 
     # Use harmonic mean (F1-style) for balanced metric
@@ -252,7 +393,8 @@ def compute_structure_match(
     original_mask: Image.Image | np.ndarray,
     generated_image: Image.Image | np.ndarray,
     config: Optional[StructureMatchConfig] = None,
-    extraction_method: str = "adaptive"
+    extraction_method: str = "adaptive",
+    generated_mask: Optional[Image.Image | np.ndarray] = None
 ) -> StructureMatchResult:
     """
     Main function to compute structure preservation score.
@@ -265,6 +407,8 @@ def compute_structure_match(
         generated_image: AI-generated output image
         config: Structure matching configuration
         extraction_method: Method to extract sigil from generated image
+        generated_mask: Known stroke mask of the generated image (e.g. from
+            compositing); skips sigil extraction when given
 
     Returns:
         StructureMatchResult with all scores and analysis
@@ -272,49 +416,109 @@ def compute_structure_match(
     if config is None:
         config = structure_match_config
 
-    # Convert to numpy arrays
-    if isinstance(original_mask, Image.Image):
-        original_array = np.array(original_mask.convert('L'))
-    else:
-        original_array = original_mask
-        if len(original_array.shape) == 3:
-            original_array = cv2.cvtColor(original_array, cv2.COLOR_RGB2GRAY)
+    return _match_against_original(
+        _to_gray_array(original_mask), generated_image, config, extraction_method,
+        generated_mask=generated_mask
+    )
 
-    if isinstance(generated_image, Image.Image):
-        generated_array = np.array(generated_image.convert('L'))
-        generated_rgb = np.array(generated_image.convert('RGB'))
-    else:
-        if len(generated_image.shape) == 3:
-            generated_rgb = generated_image
-            generated_array = cv2.cvtColor(generated_image, cv2.COLOR_RGB2GRAY)
-        else:
-            generated_array = generated_image
-            generated_rgb = cv2.cvtColor(generated_image, cv2.COLOR_GRAY2RGB)
 
-    # Resize to match if needed
-    original_array, generated_array = resize_to_match(original_array, generated_array)
-    _, generated_rgb = resize_to_match(original_array, generated_rgb)
+# Edge tolerance used when scoring generated images against the original
+_EDGE_TOLERANCE_PX = 3
 
-    # Binarize original mask
-    original_binary = binarize_image(
-        Image.fromarray(original_array),
-        threshold=config.binarize_threshold
+
+@dataclass
+class _OriginalFeatures:
+    """Original-mask features at one size, reused across generated images."""
+
+    binary: np.ndarray                  # Binarized original (0 or 255)
+    edges: np.ndarray                   # Canny edges
+    edges_dilated: np.ndarray           # Edges dilated by the match tolerance
+
+
+def _to_gray_array(image: Image.Image | np.ndarray) -> np.ndarray:
+    """Convert a PIL image or RGB/grayscale array to a grayscale array."""
+    if isinstance(image, Image.Image):
+        return np.asarray(image if image.mode == 'L' else image.convert('L'))
+    if len(image.shape) == 3:
+        return cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+    return image
+
+
+def _original_features(
+    original_array: np.ndarray,
+    config: StructureMatchConfig
+) -> _OriginalFeatures:
+    """Binarize the original and detect its edges."""
+    _, binary = cv2.threshold(
+        original_array, config.binarize_threshold, 255, cv2.THRESH_BINARY
     )
+    edges, edges_dilated = _detect_edges(original_array, 50, 150, _EDGE_TOLERANCE_PX)
 
-    # Extract sigil structure from generated
-    generated_binary = extract_sigil_from_generated(
-        Image.fromarray(generated_rgb),
-        method=extraction_method
+    return _OriginalFeatures(
+        binary=binary,
+        edges=edges,
+        edges_dilated=edges_dilated,
     )
 
+
+def _match_against_original(
+    original_array: np.ndarray,
+    generated_image: Image.Image | np.ndarray,
+    config: StructureMatchConfig,
+    extraction_method: str,
+    features_cache: Optional[dict] = None,
+    generated_mask: Optional[Image.Image | np.ndarray] = None
+) -> StructureMatchResult:
+    """
+    Implementation of compute_structure_match on a grayscale original.
+
+    Args:
+        original_array: Grayscale original mask
+        generated_image: AI-generated output image
+        config: Structure matching configuration
+        extraction_method: Method to extract sigil from generated image
+        features_cache: Optional dict of original features keyed by size,
+            shared across images scored against the same original
+        generated_mask: Optional known stroke mask of the generated image
+
+    Returns:
+        StructureMatchResult with all scores and analysis
+    """
+    # Grayscale once; extraction and edge detection both reuse it
+    generated_array = _to_gray_array(generated_image)
+
+    # Resize to match if needed
+    original_array, generated_array = resize_to_match(original_array, generated_array)
+
+    # Binarize original and detect its edges (once per size when cached)
+    if features_cache is None:
+        original = _original_features(original_array, config)
+    else:
+        size = original_array.shape[:2]
+        original = features_cache.get(size)
+        if original is None:
+            original = features_cache.setdefault(size, _original_features(original_array, config))
+
+    if generated_mask is not None:
+        # Caller already knows where the strokes are
+        generated_binary = _to_gray_array(generated_mask)
+        if generated_binary.shape != original_array.shape:
+            height, width = original_array.shape[:2]
+            generated_binary = cv2.resize(
+                generated_binary, (width, height), interpolation=cv2.INTER_NEAREST
+            )
+        extraction_method = "provided_mask"
+    else:
+        # Extract sigil structure from generated
+        generated_binary = _extract_sigil_from_gray(generated_array, extraction_method)
+
     # Compute IoU
-    iou_score, iou_analysis = compute_iou(original_binary, generated_binary)
+    iou_score, iou_analysis = compute_iou(original.binary, generated_binary)
 
     # Compute edge overlap
-    edge_score, edge_analysis = compute_edge_overlap(
-        original_array,
-        generated_array,
-        tolerance_px=3
+    edges, edges_dilated = _detect_edges(generated_array, 50, 150, _EDGE_TOLERANCE_PX)
+    edge_score, edge_analysis = _edge_overlap_score(
+        original.edges, original.edges_dilated, edges, edges_dilated
     )
 
     # Compute combined score
@@ -372,10 +576,22 @@ def compute_batch_structure_match(
     Returns:
         List of StructureMatchResult for each image
     """
-    return [
-        compute_structure_match(original_mask, img, config)
-        for img in generated_images
-    ]
+    if config is None:
+        config = structure_match_config
+
+    # Convert the shared original once, and binarize/edge-detect it once per
+    # size instead of once per image
+    original_array = _to_gray_array(original_mask)
+    features_cache: dict = {}
+
+    def score(img):
+        return _match_against_original(original_array, img, config, "adaptive", features_cache)
+
+    if len(generated_images) <= 1:
+        return [score(img) for img in generated_images]
+
+    # Score images in parallel; the numba IoU kernel is serial, so thread-safe
+    return list(_batch_executor.map(score, generated_images))
 
 
 def should_regenerate(
@@ -14,11 +14,18 @@ Run with: pytest tests/test_structure_preservation.py -v
 
 import pytest
 import numpy as np
+import cv2
 from PIL import Image, ImageDraw
 import io
+import logging
+import re
 import base64
 import sys
 import os
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 # Add src to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
@@ -28,21 +35,38 @@ from src.preprocessing import (
     thicken_strokes,
     create_stroke_mask,
     create_dilated_mask,
+    enhance_edges,
 )
 from src.structure_matching import (
     compute_structure_match,
+    compute_batch_structure_match,
     compute_iou,
+    compute_iou_batch,
     binarize_image,
+    StructureMatchResult,
 )
 from src.compositing import (
     composite_original_lines,
     composite_sigil_on_background,
+    apply_sigil_texture,
 )
 from src.config import (
     structure_match_config,
     preprocess_config,
     STYLE_PRESETS,
 )
+from fastapi.testclient import TestClient
+
+from src.batching import AsyncBatchQueue
+from src.generation import GenerationResult
+from src import api, compositing, generation
+
+
+logger = logging.getLogger(__name__)
+
+# Structure-protection phrases expected in style prompts (one compiled scan each)
+_REQUIRED_PROMPT_RE = re.compile(r'preserve|geometry|exact', re.IGNORECASE)
+_FORBIDDEN_NEGATIVE_RE = re.compile(r'extra lines|decorative circle|altered shape', re.IGNORECASE)
 
 
 # ============================================================================
@@ -79,6 +103,20 @@ def sigil_image():
     return img
 
 
+@pytest.fixture
+def sigil_array(sigil_image):
+    """Read-only uint8 view of sigil_image (no copy)."""
+    return np.asarray(sigil_image)
+
+
+@pytest.fixture
+def sigil_png_base64(sigil_image):
+    """Sigil as a base64 PNG data URL (no SVG rasterizer needed)."""
+    buffer = io.BytesIO()
+    sigil_image.save(buffer, format='PNG')
+    return "data:image/png;base64," + base64.b64encode(buffer.getvalue()).decode('ascii')
+
+
 @pytest.fixture
 def matching_generated_image():
     """Create a 'generated' image that matches the sigil structure."""
@@ -104,6 +142,15 @@ def drifted_generated_image():
     return img
 
 
+@pytest.fixture(scope="session")
+def different_image():
+    """Create an unrelated 'generated' image (a circle, no cross). Read-only."""
+    img = Image.new('RGB', (256, 256), (100, 50, 50))
+    draw = ImageDraw.Draw(img)
+    draw.ellipse([(50, 50), (200, 200)], outline=(255, 255, 255), width=5)
+    return img
+
+
 # ============================================================================
 # Preprocessing Tests
 # ============================================================================
@@ -120,13 +167,13 @@ class TestPreprocessing:
         assert result.stroke_mask is not None
         assert result.dilated_mask is not None
 
-    def test_stroke_thickening(self, sigil_image):
+    def test_stroke_thickening(self, sigil_image, sigil_array):
         """Test that stroke thickening increases stroke width."""
         thickened = thicken_strokes(sigil_image, multiplier=2.0)
 
         # Count white pixels - thickened should have more
-        original_pixels = np.array(sigil_image).sum()
-        thickened_pixels = np.array(thickened).sum()
+        original_pixels = sigil_array.sum()
+        thickened_pixels = np.asarray(thickened).sum()
 
         assert thickened_pixels > original_pixels * 1.3  # At least 30% more
 
@@ -134,34 +181,55 @@ class TestPreprocessing:
         """Test stroke mask is binary and covers strokes."""
         mask = create_stroke_mask(sigil_image)
 
-        mask_array = np.array(mask)
-        unique_values = np.unique(mask_array)
+        mask_array = np.asarray(mask)
 
         # Should be binary (only 0 and 255)
-        assert len(unique_values) <= 2
-        assert 255 in unique_values or 0 in unique_values
+        assert np.count_nonzero((mask_array != 0) & (mask_array != 255)) == 0
+        assert mask_array.max() == 255
 
     def test_dilated_mask_is_larger(self, sigil_image):
         """Test dilated mask is larger than stroke mask."""
         mask = create_stroke_mask(sigil_image)
         dilated = create_dilated_mask(mask, dilation_px=6)
 
-        mask_pixels = np.array(mask).sum()
-        dilated_pixels = np.array(dilated).sum()
+        mask_pixels = np.count_nonzero(np.asarray(mask))
+        dilated_pixels = np.count_nonzero(np.asarray(dilated))
 
         assert dilated_pixels > mask_pixels
 
+    def test_preprocess_result_is_cached(self, sigil_image):
+        """Test repeated preprocessing of the same input reuses the cached result."""
+        buffer = io.BytesIO()
+        sigil_image.save(buffer, format="PNG")
+        png_bytes = buffer.getvalue()
+
+        first = preprocess_control_image(png_bytes)
+        second = preprocess_control_image(png_bytes)
+
+        assert second is first
+
+    def test_edge_enhancement_is_thread_safe(self, sigil_image):
+        """Test the unsharp kernel can run concurrently from worker threads."""
+        expected = np.array(enhance_edges(sigil_image))
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(
+                lambda _: np.array(enhance_edges(sigil_image)), range(32)
+            ))
+
+        assert all(np.array_equal(r, expected) for r in results)
+
     def test_padding_centers_content(self, simple_sigil_svg):
         """Test that padding centers the sigil."""
         result = preprocess_control_image(simple_sigil_svg)
 
         # Check that content is roughly centered
-        img_array = np.array(result.control_image.convert('L'))
-        coords = np.column_stack(np.where(img_array > 10))
+        img_array = result.control_gray
+        moments = cv2.moments((img_array > 10).view(np.uint8), binaryImage=True)
 
-        if len(coords) > 0:
-            center_y = coords[:, 0].mean()
-            center_x = coords[:, 1].mean()
+        if moments['m00'] > 0:
+            center_y = moments['m01'] / moments['m00']
+            center_x = moments['m10'] / moments['m00']
 
             # Should be within 20% of center
             expected_center = result.control_image.size[0] / 2
@@ -176,9 +244,9 @@ class TestPreprocessing:
 class TestStructureMatching:
     """Test structure matching and IoU calculation."""
 
-    def test_identical_images_score_high(self, sigil_image):
+    def test_identical_images_score_high(self, sigil_array):
         """Test that identical images have IoU close to 1.0."""
-        iou, _ = compute_iou(np.array(sigil_image), np.array(sigil_image))
+        iou, _ = compute_iou(sigil_array, sigil_array)
         assert iou > 0.99
 
     def test_matching_images_pass_threshold(self, sigil_image, matching_generated_image):
@@ -187,31 +255,43 @@ class TestStructureMatching:
 
         assert result.combined_score >= 0.7
         # Note: exact threshold depends on extraction method
-        print(f"Matching image score: {result.combined_score:.3f}")
+        logger.debug("Matching image score: %.3f", result.combined_score)
 
     def test_drifted_images_fail_threshold(self, sigil_image, drifted_generated_image):
         """Test that drifted images are detected."""
         result = compute_structure_match(sigil_image, drifted_generated_image)
 
         # Drifted image should score lower due to extra elements
-        print(f"Drifted image score: {result.combined_score:.3f}")
-        print(f"Classification: {result.classification}")
+        logger.debug("Drifted image score: %.3f", result.combined_score)
+        logger.debug("Classification: %s", result.classification)
 
         # The score should be lower than matching, indicating drift
         # but exact behavior depends on extraction method
 
-    def test_completely_different_fails(self, sigil_image):
+    def test_completely_different_fails(self, sigil_image, different_image):
         """Test that completely different image fails."""
-        # Create a completely different image
-        different = Image.new('RGB', sigil_image.size, (100, 50, 50))
-        draw = ImageDraw.Draw(different)
-        draw.ellipse([(50, 50), (200, 200)], outline=(255, 255, 255), width=5)
-
-        result = compute_structure_match(sigil_image, different)
+        result = compute_structure_match(sigil_image, different_image)
 
         assert result.combined_score < 0.5
         assert result.classification in ['Style Drift', 'More Artistic']
 
+    def test_iou_batch_matches_pairwise(self, sigil_image, matching_generated_image,
+                                        drifted_generated_image):
+        """Test that batched IoU agrees with per-pair compute_iou."""
+        masks = [
+            np.asarray(img.convert('L'))
+            for img in (sigil_image, matching_generated_image, drifted_generated_image)
+        ]
+        masks.append(np.zeros_like(masks[0]))
+        stack = np.stack(masks)
+
+        scores = compute_iou_batch(stack, stack)
+
+        assert scores.shape == (len(masks), len(masks))
+        for i, ref in enumerate(masks):
+            for j, pred in enumerate(masks):
+                assert scores[i, j] == pytest.approx(compute_iou(ref, pred)[0])
+
     def test_classification_labels(self, sigil_image, matching_generated_image):
         """Test that classification labels are correct."""
         result = compute_structure_match(sigil_image, matching_generated_image)
@@ -219,6 +299,38 @@ class TestStructureMatching:
         valid_classifications = ['Structure Preserved', 'More Artistic', 'Style Drift']
         assert result.classification in valid_classifications
 
+    def test_provided_generated_mask_skips_extraction(self, sigil_image, drifted_generated_image):
+        """Test a caller-supplied stroke mask is used instead of extraction."""
+        result = compute_structure_match(
+            sigil_image,
+            drifted_generated_image,
+            generated_mask=sigil_image
+        )
+
+        assert result.iou_score == 1.0
+        assert result.analysis["extraction_method"] == "provided_mask"
+
+    def test_batch_matches_single(self, sigil_image, matching_generated_image, drifted_generated_image):
+        """Test batch scoring returns the same results as scoring one by one."""
+        images = [matching_generated_image, drifted_generated_image] * 2
+
+        batch = compute_batch_structure_match(sigil_image, images)
+        single = [compute_structure_match(sigil_image, img) for img in images]
+
+        assert [r.combined_score for r in batch] == [r.combined_score for r in single]
+        assert [r.classification for r in batch] == [r.classification for r in single]
+
+    def test_iou_is_thread_safe(self, sigil_image, matching_generated_image):
+        """Test IoU counting can run concurrently from worker threads."""
+        mask1 = binarize_image(sigil_image)
+        mask2 = binarize_image(matching_generated_image)
+        expected = compute_iou(mask1, mask2)
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(lambda _: compute_iou(mask1, mask2), range(32)))
+
+        assert all(r == expected for r in results)
+
 
 # ============================================================================
 # Compositing Tests
@@ -256,11 +368,54 @@ class TestCompositing:
 
         # The background should contain colors from the generated image
         # (not pure black like the original sigil)
-        composite_array = np.array(result.composite_image)
-        bg_sample = composite_array[10, 10]  # Sample corner (should be background)
+        composite_array = np.asarray(result.composite_image)
+        # Mean over a corner tile (should be background), robust to single pixels
+        bg_mean = cv2.mean(composite_array[:32, :32])[:3]
 
         # Background should not be pure black
-        assert sum(bg_sample) > 10
+        assert sum(bg_mean) > 10
+
+    def test_background_only_is_inpainted(self, sigil_image, matching_generated_image):
+        """Test generated strokes are removed from the background layer."""
+        result = composite_original_lines(
+            sigil_image,
+            matching_generated_image,
+            blend_texture=False
+        )
+
+        # Generated strokes are bright (200, 180, 120) on a dark background;
+        # after inpainting the stroke area should be dark too
+        stroke_area = np.asarray(result.blend_mask.convert('L')) > 127
+        background = np.asarray(result.background_only.convert('L'))
+        assert background[stroke_area].mean() < 100
+
+    def test_texture_blend_is_thread_safe(self, sigil_image, matching_generated_image):
+        """Test blend kernels can run concurrently from worker threads."""
+        sigil_rgb = sigil_image.convert('RGB')
+        expected = np.array(apply_sigil_texture(
+            sigil_rgb, matching_generated_image, blend_mode="soft_light"
+        ))
+
+        def blend(_):
+            return np.array(apply_sigil_texture(
+                sigil_rgb, matching_generated_image, blend_mode="soft_light"
+            ))
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(blend, range(32)))
+
+        assert all(np.array_equal(r, expected) for r in results)
+
+    def test_alpha_composite_matches_numpy(self, monkeypatch, sigil_image, matching_generated_image):
+        """Test the fused alpha-blend kernel matches the numpy fallback exactly."""
+        args = (sigil_image.convert('RGB'), sigil_image, matching_generated_image)
+        kwargs = {"sigil_color": (200, 180, 120), "opacity": 0.8}
+
+        fused = np.array(composite_sigil_on_background(*args, **kwargs))
+        monkeypatch.setattr(compositing, "HAS_NUMBA", False)
+        reference = np.array(composite_sigil_on_background(*args, **kwargs))
+
+        assert np.array_equal(fused, reference)
 
 
 # ============================================================================
@@ -279,22 +434,14 @@ class TestConfiguration:
 
     def test_all_styles_have_strict_prompts(self):
         """Test all style presets have structure-preserving prompts."""
-        required_phrases = ['preserve', 'geometry', 'exact']
-
         for name, preset in STYLE_PRESETS.items():
-            prompt_lower = preset.prompt_template.lower()
-
-            has_required = any(phrase in prompt_lower for phrase in required_phrases)
+            has_required = _REQUIRED_PROMPT_RE.search(preset.prompt_template)
             assert has_required, f"Style '{name}' prompt missing structure preservation language"
 
     def test_all_styles_have_strict_negative_prompts(self):
         """Test all styles have negative prompts preventing structure change."""
-        forbidden_in_negative = ['extra lines', 'decorative circle', 'altered shape']
-
         for name, preset in STYLE_PRESETS.items():
-            negative_lower = preset.negative_prompt.lower()
-
-            has_forbidden = any(phrase in negative_lower for phrase in forbidden_in_negative)
+            has_forbidden = _FORBIDDEN_NEGATIVE_RE.search(preset.negative_prompt)
             assert has_forbidden, f"Style '{name}' negative prompt missing structure protection"
 
     def test_stroke_multiplier_reasonable(self):
@@ -304,6 +451,265 @@ class TestConfiguration:
         assert 1.5 <= multiplier <= 3.0
 
 
+# ============================================================================
+# Batching Tests
+# ============================================================================
+
+def _fake_variation(seed: int, preserved: bool) -> GenerationResult:
+    """Build a GenerationResult without calling Replicate."""
+    score = 0.9 if preserved else 0.5
+    return GenerationResult(
+        image=Image.new('RGB', (8, 8)),
+        structure_match=StructureMatchResult(
+            iou_score=score,
+            edge_overlap_score=score,
+            combined_score=score,
+            structure_preserved=preserved,
+            classification="Structure Preserved" if preserved else "Style Drift",
+            analysis={},
+        ),
+        seed=seed,
+        generation_time_ms=0,
+    )
+
+
+class TestBatching:
+    """Test request micro-batching and per-request results."""
+
+    def test_batch_queue_groups_by_key(self):
+        """Test requests sharing a key are fused and results stay aligned."""
+        calls = []
+
+        async def process(key, payloads):
+            calls.append((key, payloads))
+            return [f"{key}:{p}" for p in payloads]
+
+        async def run():
+            queue = AsyncBatchQueue(process, max_batch_size=8, max_wait_time=0.05)
+            queue.start()
+            try:
+                return await asyncio.gather(
+                    queue.add_request("a", 1),
+                    queue.add_request("b", 2),
+                    queue.add_request("a", 3),
+                )
+            finally:
+                await queue.stop()
+
+        results = asyncio.run(run())
+
+        assert results == ["a:1", "b:2", "a:3"]
+        assert sorted(calls) == [("a", [1, 3]), ("b", [2])]
+
+    def test_batch_queue_propagates_errors(self):
+        """Test a failing group fails every request in it."""
+        async def process(key, payloads):
+            raise RuntimeError("upstream down")
+
+        async def run():
+            queue = AsyncBatchQueue(process)
+            queue.start()
+            try:
+                return await asyncio.gather(
+                    queue.add_request("a", 1),
+                    queue.add_request("a", 2),
+                    return_exceptions=True,
+                )
+            finally:
+                await queue.stop()
+
+        results = asyncio.run(run())
+
+        assert all(isinstance(r, RuntimeError) for r in results)
+
+    def test_batch_queue_requires_start(self):
+        """Test submitting before start raises."""
+        queue = AsyncBatchQueue(lambda key, payloads: payloads)
+
+        with pytest.raises(RuntimeError):
+            asyncio.run(queue.add_request("a", 1))
+
+    def test_batched_generate_is_per_request(self, monkeypatch, sigil_png_base64):
+        """Test batched requests keep their own seeds and retry decisions."""
+        async def fake_single(control_image_b64, stroke_mask, style_preset, seed, config):
+            # First-pass seeds below 2900 drift; retry seeds (5000+) pass
+            return _fake_variation(seed, preserved=seed >= 2900)
+
+        monkeypatch.setattr(generation, "generate_single_variation", fake_single)
+
+        large, small = asyncio.run(
+            api._batched_generate((sigil_png_base64, "watercolor"), [4, 2])
+        )
+
+        # 4 variations: 2 pass on their own, so no retry
+        assert [v.seed for v in large.variations] == [2000, 2456, 2912, 3368]
+        assert large.passing_count == 2
+
+        # 2 variations: both drift, so both are retried
+        assert [v.seed for v in small.variations] == [5000, 5789]
+        assert small.passing_count == 2
+
+    def test_replicate_calls_are_capped(self, monkeypatch):
+        """Test in-flight Replicate calls never exceed the generation limit."""
+        lock = threading.Lock()
+        in_flight = {"now": 0, "peak": 0}
+
+        class FakeClient:
+            def run(self, model, input):
+                with lock:
+                    in_flight["now"] += 1
+                    in_flight["peak"] = max(in_flight["peak"], in_flight["now"])
+                time.sleep(0.02)
+                with lock:
+                    in_flight["now"] -= 1
+                return "https://example.invalid/out.png"
+
+        # Oversized pool, so only the generation slots can enforce the cap
+        executor = ThreadPoolExecutor(max_workers=8)
+        monkeypatch.setattr(generation, "_replicate_executor", executor)
+        monkeypatch.setattr(generation, "GENERATION_LIMIT", 2)
+        monkeypatch.setattr(generation, "_generation_semaphore", None)
+        monkeypatch.setattr(generation, "_get_replicate_client", lambda: FakeClient())
+
+        async def run():
+            return await asyncio.gather(*[
+                generation._submit_generation(
+                    "data:image/png;base64,", STYLE_PRESETS["watercolor"], seed,
+                    generation.controlnet_config,
+                )
+                for seed in range(8)
+            ])
+
+        try:
+            urls = asyncio.run(run())
+        finally:
+            executor.shutdown(wait=True)
+
+        assert len(urls) == 8
+        assert in_flight["peak"] == 2
+        assert generation.get_generation_stats() == {"limit": 2, "active": 0, "waiting": 0}
+
+
+# ============================================================================
+# API Tests
+# ============================================================================
+
+class TestAPI:
+    """Test HTTP endpoints with generation stubbed out."""
+
+    def test_stream_is_not_gzipped(self, monkeypatch, sigil_png_base64):
+        """Test /enhance/stream bypasses GZip so parts flush as they finish."""
+        async def fake_iter(input_data, style_name, num_variations=4, **kwargs):
+            rng = np.random.default_rng(0)
+            for i in range(num_variations):
+                noise = rng.integers(0, 256, (64, 64, 3), dtype=np.uint8)
+                var = _fake_variation(2000 + i * 456, preserved=True)
+                var.image = Image.fromarray(noise)
+                yield var
+
+        monkeypatch.setattr(api, "iter_styled_variations", fake_iter)
+
+        response = TestClient(api.app).post(
+            "/enhance/stream",
+            json={
+                "sigil_svg": sigil_png_base64,
+                "style_choice": "watercolor",
+                "user_id": "u",
+                "anchor_id": "a",
+                "num_variations": 2,
+            },
+            headers={"Accept-Encoding": "gzip"},
+        )
+
+        assert response.status_code == 200
+        assert response.headers["content-encoding"] == "identity"
+        assert response.content.count(b"\x89PNG") == 2
+
+    def test_stream_multipart_framing(self, monkeypatch, sigil_png_base64):
+        """Test each variation is one PNG part and the stream is closed."""
+        async def fake_single(control_image_b64, stroke_mask, style_preset, seed, config):
+            return _fake_variation(seed, preserved=True)
+
+        monkeypatch.setattr(generation, "generate_single_variation", fake_single)
+
+        response = TestClient(api.app).post(
+            "/enhance/stream",
+            json={
+                "sigil_svg": sigil_png_base64,
+                "style_choice": "watercolor",
+                "user_id": "u",
+                "anchor_id": "a",
+                "num_variations": 3,
+            },
+        )
+
+        assert response.status_code == 200
+        content_type = response.headers["content-type"]
+        assert content_type.startswith("multipart/mixed; boundary=")
+        boundary = content_type.split("boundary=")[1].encode()
+
+        body = response.content
+        assert body.startswith(b"--" + boundary + b"\r\n")
+        assert body.endswith(b"\r\n--" + boundary + b"--\r\n")
+
+        parts = body.split(b"--" + boundary)[1:-1]
+        seeds = []
+        for part in parts:
+            head, payload = part.split(b"\r\n\r\n", 1)
+            headers = dict(
+                line.split(": ", 1) for line in head.decode().strip().split("\r\n")
+            )
+            assert headers["Content-Type"] == "image/png"
+            assert headers["X-Structure-Preserved"] == "True"
+            assert payload.startswith(b"\x89PNG") and payload.endswith(b"\r\n")
+            seeds.append(int(headers["X-Seed"]))
+
+        assert sorted(seeds) == [2000, 2456, 2912]
+
+    def test_stream_cancels_remaining_on_failure(self, monkeypatch, sigil_png_base64):
+        """Test a failing variation cancels the variations still running."""
+        cancelled = []
+
+        async def fake_single(control_image_b64, stroke_mask, style_preset, seed, config):
+            if seed == 2000:
+                raise RuntimeError("prediction failed")
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(seed)
+                raise
+            return _fake_variation(seed, preserved=True)
+
+        monkeypatch.setattr(generation, "generate_single_variation", fake_single)
+
+        with TestClient(api.app) as client:
+            # Starlette surfaces streaming errors inside an ExceptionGroup
+            with pytest.raises(ExceptionGroup) as excinfo:
+                client.post(
+                    "/enhance/stream",
+                    json={
+                        "sigil_svg": sigil_png_base64,
+                        "style_choice": "watercolor",
+                        "user_id": "u",
+                        "anchor_id": "a",
+                        "num_variations": 3,
+                    },
+                )
+            # (searched with stdlib subgroup; group_contains needs pytest >= 8)
+            failures = excinfo.value.subgroup(
+                lambda exc: isinstance(exc, RuntimeError) and "prediction failed" in str(exc)
+            )
+            assert failures is not None
+
+            # Cancellation is delivered on the app's event loop
+            deadline = time.monotonic() + 2.0
+            while len(cancelled) < 2 and time.monotonic() < deadline:
+                time.sleep(0.01)
+
+            # Checked before shutdown, which would cancel stragglers anyway
+            assert sorted(cancelled) == [2456, 2912]
+
+
 # ============================================================================
 # Integration Tests
 # ============================================================================
@@ -328,9 +734,11 @@ class TestIntegration:
         """Test structure matching works with preprocessed control image."""
         preprocess_result = preprocess_control_image(simple_sigil_svg)
 
-        # Resize generated to match
-        generated_resized = matching_generated_image.resize(
-            preprocess_result.control_image.size
+        # Resize generated to match (compute_structure_match takes arrays directly)
+        generated_resized = cv2.resize(
+            np.asarray(matching_generated_image),
+            preprocess_result.control_image.size,
+            interpolation=cv2.INTER_AREA
         )
 
         match_result = compute_structure_match(
@@ -398,6 +806,22 @@ def validate_structure_preservation():
     print(f"    Identical images IoU: {iou:.4f}")
     print(f"    Status: {'PASS' if iou > 0.99 else 'FAIL'}")
 
+    # Test 5: Batched IoU Test (random 50% masks: expected IoU ~1/3)
+    print("\n[5] Batched IoU Test")
+    rng = np.random.default_rng(0)
+    refs = rng.integers(0, 2, (200, 64, 64), dtype=np.uint8) * np.uint8(255)
+    preds = rng.integers(0, 2, (200, 64, 64), dtype=np.uint8) * np.uint8(255)
+
+    start = time.perf_counter_ns()
+    ious = compute_iou_batch(refs, preds).diagonal()
+    elapsed_ms = (time.perf_counter_ns() - start) / 1e6
+
+    agrees = all(
+        abs(ious[i] - compute_iou(refs[i], preds[i])[0]) < 1e-6 for i in range(0, 200, 20)
+    )
+    print(f"    Mean IoU over {len(ious)} pairs: {ious.mean():.4f} ({elapsed_ms:.2f} ms)")
+    print(f"    Status: {'PASS' if agrees and 0.3 < ious.mean() < 0.37 else 'FAIL'}")
+
     # Summary
     print("\n" + "=" * 60)
     print("Validation complete. Check results above for any FAIL or WARN.")